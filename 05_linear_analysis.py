@@ -1,5 +1,6 @@
 from typing import Callable
 from numpy import log2, uint8, uint16
+import numpy as np
 import random
 
 
@@ -49,6 +50,45 @@ def generateSPN(sBox : list[list[uint8]], pBox : list[list[uint8]], numRounds :
     return encipher
 
 
+def generateVectorizedSPN(sBox : list[list[uint8]], pBox : list[list[uint8]], numRounds : int) -> Callable[[np.ndarray, list[uint16]], np.ndarray]:
+    """
+    Generates the same enciphering method as generateSPN but working on whole numpy arrays of plaintexts at once.
+
+    Args:
+        sBox (list[uint8]): S-boxes per round. See generateSPN.
+        pBox (list[uint8]): P-boxes per round. See generateSPN.
+        numRounds (int): How many rounds should be done. The sBox and pBox should have at liest this many elements.
+
+    Returns:
+        Callable[[np.ndarray, list[uint16]], np.ndarray]: The created enciphering method for the spn. It maps an uint16 array of plaintexts to an uint16 array of cryptotexts.
+    """
+    sBoxArrays = [ np.array(sBox[round], dtype=np.uint16) for round in range(numRounds) ]
+
+    def encipher(plaintexts : np.ndarray, keys : list[uint16]) -> np.ndarray:
+        cryptotexts = np.asarray(plaintexts, dtype=np.uint16)
+
+        for round in range(numRounds):
+            # key addition
+            cryptotexts = cryptotexts ^ np.uint16(keys[round])
+
+            # substitution
+            temp = np.zeros_like(cryptotexts)
+            for chunk in range(4):
+                temp |= sBoxArrays[round][(cryptotexts >> (chunk * 4)) & 0b1111] << (chunk * 4)
+            cryptotexts = temp
+
+            # permutation, not in the last round
+            if round < numRounds-1:
+                temp = np.zeros_like(cryptotexts)
+                for bit in range(16):
+                    temp |= ((cryptotexts >> bit) & 1) << pBox[round][bit]
+                cryptotexts = temp
+
+        return cryptotexts ^ np.uint16(keys[numRounds])
+
+    return encipher
+
+
 def bindKeysToSPN(spn : Callable[[uint16, list[uint16]], uint16], keys : list[uint16]) -> Callable[[uint16], uint16]:
     """
     Binds round keys to the spn function call.
@@ -146,6 +186,110 @@ def doLinearAnalysis(plainCryptoPairs : list[tuple[uint16]], sBox : list[uint16]
     print(f"Best bias: {keyBiases[key]}")
     return bestKey
 
+def parity(values : np.ndarray) -> np.ndarray:
+    """
+    Computes the parity (xor of all bits) of every element of an uint16 array at once.
+
+    Args:
+        values (np.ndarray): Array of 16-bit values.
+
+    Returns:
+        np.ndarray: Array of the same shape containing 0 or 1 for every element.
+    """
+    values = values.astype(np.uint16)
+    values = values ^ (values >> 8)
+    values = values ^ (values >> 4)
+    values = values ^ (values >> 2)
+    values = values ^ (values >> 1)
+    return (values & 1).astype(np.uint8)
+
+def doMultipleLinearAnalysis(plainCryptoPairs : list[tuple[uint16]], sBox : list[uint16], approximations : list[tuple[uint16]], numCandidates : int = 10) -> list[uint16]:
+    """
+    Performs linear analysis with several linear approximations at once and combines them into a ranking of full last round keys.
+
+    In contrast to doLinearAnalysis the pairs are only touched once: For every approximation the pairs are sorted into
+    a histogram indexed by the parity of the filtered plaintext and the ciphertext chunks the approximation looks at.
+    All of that happens in one vectorised sweep over the data. Afterwards the counters for every key guess are computed
+    from these (small) histograms instead of the pairs.
+
+    Every full key gets the score sum(N * bias²) over all approximations, where bias is the bias of the key's chunks that
+    are included in the approximation. Chunks not covered by any approximation can not be distinguished.
+
+    Args:
+        plainCryptoPairs (list[tuple[uint16]]): All available plaintext ciphertext pairs. (8000 or more)
+        sBox (list[uint16]): The sBox used in the spn at the last round.
+        approximations (list[tuple[uint16]]): Pairs of (approximationInputs, approximationLastRound) as they are used in doLinearAnalysis.
+        numCandidates (int, optional): How many of the best full keys should be returned. Defaults to 10.
+
+    Raises:
+        ValueError: If an approximation includes all 4 chunks of the last round. (The counter table would have 2^32 entries)
+
+    Returns:
+        list[uint16]: The best full last round keys. The most probable one comes first.
+    """
+    # calculate inverse sBox
+    sBoxInv = np.zeros(16, dtype=np.uint16)
+    for index, val in enumerate(sBox):
+        sBoxInv[val] = index
+
+    pairs = np.array(plainCryptoPairs, dtype=np.uint16).reshape(-1, 2)
+    plaintexts, cryptotexts = pairs[:, 0], pairs[:, 1]
+
+    # which chunks do we have to include in the key search per approximation
+    includedChunks = []
+    for _, approximationLastRound in approximations:
+        chunks = [i for i in range(4) if ((approximationLastRound >> i*4) & 0b1111) != 0]
+        if len(chunks) == 4:
+            raise ValueError("Approximations may include at most 3 chunks of the last round")
+        includedChunks.append(chunks)
+
+    # the single sweep over the data
+    # histogram index: parity of the filtered plaintext followed by the included ciphertext chunks
+    inputMasks = np.array([ a[0] for a in approximations ], dtype=np.uint16)
+    inputParities = parity(plaintexts[None, :] & inputMasks[:, None]).astype(np.int64)
+    chunkValues = np.stack([ (cryptotexts >> (chunk * 4)) & 0b1111 for chunk in range(4) ]).astype(np.int64)
+
+    offsets = []
+    indices = []
+    binCount = 0
+    for approxIndex, chunks in enumerate(includedChunks):
+        index = inputParities[approxIndex]
+        for chunk in chunks:
+            index = (index << 4) | chunkValues[chunk]
+        offsets.append(binCount)
+        indices.append(index + binCount)
+        binCount += 2 << (len(chunks) * 4)
+
+    histograms = np.bincount(np.concatenate(indices), minlength=binCount)
+
+    # turn the histograms into a bias for every (partial) key guess
+    scores = np.zeros(1 << 16)
+    allKeys = np.arange(1 << 16, dtype=np.int64)
+    for (_, approximationLastRound), chunks, offset in zip(approximations, includedChunks, offsets):
+        numValues = 1 << (len(chunks) * 4)
+        histogram = histograms[offset : offset + 2 * numValues].reshape(2, numValues)
+
+        # partialParity[g, v] = parity of the guessed bits before the last substitution
+        # for the smushed key guess g and the smushed ciphertext chunks v
+        partialParity = np.zeros((1, 1), dtype=np.uint8)
+        nibbles = np.arange(16, dtype=np.uint16)
+        for chunk in chunks:
+            mask = (approximationLastRound >> (chunk * 4)) & 0b1111
+            table = parity(sBoxInv[nibbles[:, None] ^ nibbles[None, :]] & mask)
+            partialParity = (partialParity[:, None, :, None] ^ table[None, :, None, :]).reshape(partialParity.shape[0] * 16, -1)
+
+        succeededAttempts = (histogram[0][None, :] * (partialParity == 0)).sum(axis=1) + (histogram[1][None, :] * (partialParity == 1)).sum(axis=1)
+        biases = succeededAttempts / len(pairs) - 1/2
+
+        # look up the bias for every full key
+        smushedKeys = np.zeros(1 << 16, dtype=np.int64)
+        for chunk in chunks:
+            smushedKeys = (smushedKeys << 4) | ((allKeys >> (chunk * 4)) & 0b1111)
+        scores += len(pairs) * biases[smushedKeys] ** 2
+
+    ranking = np.argsort(-scores, kind='stable')[:numCandidates]
+    return [ uint16(key) for key in ranking ]
+
 if __name__ == "__main__":
     SBOX = [ 0xE, 0x4, 0xD, 0x1, 0x2, 0xF, 0xB, 0x8, 0x3, 0xA, 0x6, 0xC, 0x5, 0x9, 0x0, 0x7 ]
     PBOX = [ 0x0, 0x4, 0x8, 0xC, 0x1, 0x5, 0x9, 0xD, 0x2, 0x6, 0xA, 0xE, 0x3, 0x7, 0xB, 0xF ]
@@ -167,3 +311,9 @@ if __name__ == "__main__":
     print("{:16b}".format(guessedKey))
     print("Actual Key:")
     print("{:16b}".format(KEY))
+
+    # all 4 chunks of the last round key with two approximations in a single pass
+    candidates = doMultipleLinearAnalysis(plainCryptoPairs, SBOX, [(0b0000101100000000, 0b0000010100000101), (0b0000110100000000, 0b0100000001000000)], 5)
+    print("\nBest full key candidates:")
+    for candidate in candidates:
+        print("{:16b}".format(candidate))
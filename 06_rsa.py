@@ -1,6 +1,17 @@
-def powWithMod(base : int, exponent : int, mod : int) -> int:
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import math
+from typing import Callable, NamedTuple
+import random
+import threading
+import time
+
+
+def powWithModSquareMultiply(base : int, exponent : int, mod : int) -> int:
     """
-    Computes a modular power efficiently by using squaring and multiplying.
+    Computes a modular power by using squaring and multiplying bit by bit.
+
+    This is the plain textbook version. It is only kept as a reference, use powWithMod instead.
 
     Args:
         base (int): Base
@@ -22,6 +33,327 @@ def powWithMod(base : int, exponent : int, mod : int) -> int:
 
     return res
 
+def slidingWindowPow(base : int, exponent : int, mul : Callable[[int, int], int], one : int, windowSize : int) -> int:
+    """
+    Computes base^exponent with the left-to-right sliding window method.
+
+    Only the odd powers base^1, base^3, ..., base^(2^windowSize - 1) are precomputed. The exponent is scanned from the top
+    and every window of at most windowSize bits that starts and ends with a 1 costs a single multiplication.
+
+    Args:
+        base (int): Base (already in the representation mul works with).
+        exponent (int): Exponent. Has to be non-negative.
+        mul (Callable[[int, int], int]): Modular multiplication.
+        one (int): The neutral element in the representation mul works with.
+        windowSize (int): Maximal number of bits in a window.
+
+    Returns:
+        int: The result of the computation (in the representation mul works with).
+    """
+    # precompute odd powers
+    square = mul(base, base)
+    oddPowers = [ base ]
+    for _ in range(1, 1 << (windowSize - 1)):
+        oddPowers.append(mul(oddPowers[-1], square))
+
+    bits = bin(exponent)[2:]
+    res = one
+    i = 0
+    while i < len(bits):
+        if bits[i] == '0':
+            res = mul(res, res)
+            i += 1
+            continue
+
+        # longest window starting at i that ends with a 1
+        j = min(i + windowSize, len(bits))
+        while bits[j-1] == '0':
+            j -= 1
+
+        for _ in range(j - i):
+            res = mul(res, res)
+        res = mul(res, oddPowers[int(bits[i:j], 2) >> 1])
+        i = j
+
+    return res
+
+def windowSizeFor(exponent : int) -> int:
+    """
+    Chooses a good window size for sliding window exponentiation.
+
+    Args:
+        exponent (int): The exponent.
+
+    Returns:
+        int: Window size.
+    """
+    bits = exponent.bit_length()
+    for size, maxBits in [(1, 8), (3, 64), (4, 256), (5, 1024)]:
+        if bits <= maxBits:
+            return size
+    return 6
+
+def multiPowWithMod(bases : list[int], exponents : list[int], mod : int) -> int:
+    """
+    Computes the product of all bases[i]^exponents[i] mod mod with one shared chain of squarings. (Shamir's trick with interleaved sliding windows)
+
+    Every exponent gets split into sliding windows (see slidingWindowPow). While the bits are scanned from the top,
+    there is a single squaring per bit and a multiplication for every window of any exponent that ends at that bit.
+
+    Args:
+        bases (list[int]): Bases
+        exponents (list[int]): Exponents. Have to be non-negative.
+        mod (int): Modulus
+
+    Raises:
+        ValueError: If an exponent is negative.
+
+    Returns:
+        int: The result of the computation.
+    """
+    if any(exponent < 0 for exponent in exponents):
+        raise ValueError("Exponents have to be non-negative")
+
+    numBits = max(exponent.bit_length() for exponent in exponents)
+
+    # windowsAt[bit] = all (base index, window value) for windows with the lowest bit at position bit
+    windowsAt = [ [] for _ in range(numBits) ]
+    oddPowers = []
+    for index, (base, exponent) in enumerate(zip(bases, exponents)):
+        windowSize = windowSizeFor(exponent)
+        base %= mod
+        square = (base * base) % mod
+        powers = [ base ]
+        for _ in range(1, 1 << (windowSize - 1)):
+            powers.append((powers[-1] * square) % mod)
+        oddPowers.append(powers)
+
+        bits = bin(exponent)[2:] if exponent > 0 else ""
+        i = 0
+        while i < len(bits):
+            if bits[i] == '0':
+                i += 1
+                continue
+            j = min(i + windowSize, len(bits))
+            while bits[j-1] == '0':
+                j -= 1
+            windowsAt[len(bits) - j].append((index, int(bits[i:j], 2)))
+            i = j
+
+    res = 1 % mod
+    for bit in range(numBits - 1, -1, -1):
+        res = (res * res) % mod
+        for index, value in windowsAt[bit]:
+            res = (res * oddPowers[index][value >> 1]) % mod
+    return res
+
+class ModContext:
+    """
+    Precomputed values for repeated exponentiations with the same modulus.
+
+    The Barrett and Montgomery constants are computed lazily, the first time an exponentiation needs them.
+    Use getModContext to reuse the context of a modulus.
+    """
+
+    METHODS = ("auto", "builtin", "window", "montgomery")
+
+    # from this size on the montgomery method beats the builtin pow (see benchmarkPowWithMod)
+    MONTGOMERY_MIN_BITS = 4096
+
+    def __init__(self, mod : int):
+        self.mod = mod
+        self.bits = mod.bit_length()
+        self.barrettMu = None
+        self.montNPrime = None
+
+    def barrettReduce(self, x : int) -> int:
+        """
+        Reduces 0 <= x < mod² with Barrett's method (no division).
+        """
+        if self.barrettMu is None:
+            self.barrettMu = (1 << (2 * self.bits)) // self.mod
+
+        q = ((x >> (self.bits - 1)) * self.barrettMu) >> (self.bits + 1)
+        r = x - q * self.mod
+        while r >= self.mod:
+            r -= self.mod
+        return r
+
+    def montgomeryReduce(self, t : int) -> int:
+        """
+        Computes t * R^-1 mod mod for 0 <= t < mod * R where R = 2^bits. (REDC)
+        """
+        m = ((t & self.montMask) * self.montNPrime) & self.montMask
+        u = (t + m * self.mod) >> self.bits
+        return u - self.mod if u >= self.mod else u
+
+    def initMontgomery(self):
+        """
+        Computes the Montgomery constants. Requires an odd modulus.
+        """
+        if self.mod % 2 == 0:
+            raise ValueError("Montgomery multiplication requires an odd modulus")
+
+        r = 1 << self.bits
+        self.montMask = r - 1
+        self.montR2 = (r * r) % self.mod
+        self.montNPrime = (-mudularInverse(self.mod, r)) % r
+
+    def pow(self, base : int, exponent : int, method : str = "auto") -> int:
+        """
+        Computes base^exponent mod self.mod.
+
+        Args:
+            base (int): Base
+            exponent (int): Exponent / Power. Has to be non-negative.
+            method (str, optional): "window" (sliding window with Barrett reduction), "montgomery" (sliding window in Montgomery form),
+                "builtin" (three argument pow) or "auto". Auto uses montgomery for odd moduli with at least MONTGOMERY_MIN_BITS bits and the faster builtin pow otherwise. Defaults to "auto".
+
+        Raises:
+            ValueError: If the exponent is negative or the method is unknown.
+
+        Returns:
+            int: The result of the computation.
+        """
+        if method not in ModContext.METHODS:
+            raise ValueError("Unknown method " + method)
+        if exponent < 0:
+            raise ValueError("Exponent has to be non-negative")
+
+        if method == "auto":
+            method = "montgomery" if self.bits >= ModContext.MONTGOMERY_MIN_BITS and self.mod % 2 == 1 else "builtin"
+
+        if method == "builtin":
+            return pow(base, exponent, self.mod)
+
+        if self.mod == 1:
+            return 0
+        if exponent == 0:
+            return 1
+
+        base %= self.mod
+        windowSize = windowSizeFor(exponent)
+
+        if method == "window":
+            return slidingWindowPow(base, exponent, lambda a, b : self.barrettReduce(a * b), 1, windowSize)
+
+        # montgomery
+        if self.montNPrime is None:
+            self.initMontgomery()
+        mul = lambda a, b : self.montgomeryReduce(a * b)
+        res = slidingWindowPow(mul(base, self.montR2), exponent, mul, mul(1, self.montR2), windowSize)
+        return self.montgomeryReduce(res)
+
+@lru_cache(maxsize=128)
+def getModContext(mod : int) -> ModContext:
+    """
+    Returns the (cached) context of a modulus.
+
+    Args:
+        mod (int): The modulus.
+
+    Returns:
+        ModContext: The context.
+    """
+    return ModContext(mod)
+
+def powWithMod(base : int, exponent : int, mod : int, method : str = "auto") -> int:
+    """
+    Computes a modular power efficiently.
+
+    Args:
+        base (int): Base
+        exponent (int): Exponent / Power
+        mod (int): Mode
+        method (str, optional): Exponentiation method. See ModContext.pow. Defaults to "auto".
+
+    Returns:
+        int: The result of the computation.
+    """
+    # small moduli don't need a context
+    if method == "builtin" or (method == "auto" and mod.bit_length() < ModContext.MONTGOMERY_MIN_BITS):
+        return pow(base, exponent, mod)
+    return getModContext(mod).pow(base, exponent, method)
+
+class FixedBase:
+    """
+    Precomputed powers of a fixed base for fast repeated exponentiations with the same base and modulus.
+
+    Row i of the table holds base^(j * 2^(windowSize * i)) for all j < 2^windowSize. An exponentiation is then just
+    one multiplication per window of the exponent and no squarings at all. The table has
+    (exponent bits / windowSize) * 2^windowSize entries, so the window size controls the memory use.
+    Rows are added lazily when a longer exponent comes along. Use getFixedBase to reuse the table of a base.
+    The table may be shared by several threads, so rows are only added while holding a lock.
+    """
+
+    def __init__(self, base : int, mod : int, windowSize : int = 4):
+        self.base = base % mod
+        self.mod = mod
+        self.windowSize = windowSize
+        self.table = []
+        self.nextRowBase = self.base  # base^(2^(windowSize * len(table)))
+        self.lock = threading.Lock()
+
+    def extend(self, bits : int):
+        """
+        Adds rows to the table until exponents with the given number of bits are covered.
+
+        Args:
+            bits (int): Number of exponent bits.
+        """
+        # rows are never removed, so a covered exponent needs no lock
+        if len(self.table) * self.windowSize >= bits:
+            return
+
+        with self.lock:
+            while len(self.table) * self.windowSize < bits:
+                row = [ 1 % self.mod, self.nextRowBase ]
+                for _ in range(2, 1 << self.windowSize):
+                    row.append((row[-1] * self.nextRowBase) % self.mod)
+                self.table.append(row)
+                self.nextRowBase = (row[-1] * self.nextRowBase) % self.mod
+
+    def pow(self, exponent : int) -> int:
+        """
+        Computes base^exponent mod mod.
+
+        Args:
+            exponent (int): Exponent / Power. Has to be non-negative.
+
+        Raises:
+            ValueError: If the exponent is negative.
+
+        Returns:
+            int: The result of the computation.
+        """
+        if exponent < 0:
+            raise ValueError("Exponent has to be non-negative")
+        
+        bits = bin(exponent)[2:]
+        self.extend(len(bits))
+
+        res = 1 % self.mod
+        for row, end in enumerate(range(len(bits), 0, -self.windowSize)):
+            digit = int(bits[max(0, end - self.windowSize) : end], 2)
+            if digit != 0:
+                res = (res * self.table[row][digit]) % self.mod
+        return res
+
+@lru_cache(maxsize=8)
+def getFixedBase(base : int, mod : int, windowSize : int = 4) -> FixedBase:
+    """
+    Returns the (cached) precomputed table of a base and modulus.
+
+    Args:
+        base (int): The fixed base.
+        mod (int): The modulus.
+        windowSize (int, optional): Bits per window. See FixedBase. Defaults to 4.
+
+    Returns:
+        FixedBase: The table.
+    """
+    return FixedBase(base, mod, windowSize)
+
 def extendedEucildianAlgorithm(a : int, b : int) -> tuple[int]:
     """
     Performs the extended euklidian algorithm with paramenters a, b.
@@ -59,33 +391,443 @@ def mudularInverse(num : int, mod : int) -> int:
     """
     Computes the inverse of a number modolu another number.
 
-    Basically performes the extended euklidian algorithm and extracts the right values.
+    The builtin pow (which performes the extended euklidian algorithm in C) is used, as it is about twice as fast as
+    extendedEucildianAlgorithm and lehmerModularInverse at every size (see benchmarkModularInverse).
 
     Args:
         num (int): The number that sjhould be inverted.
         mod (int): The modulus.
 
+    Raises:
+        ValueError: If num is not invertible modulo mod.
+
     Returns:
         int: The inverse of num.
     """
-    return (extendedEucildianAlgorithm(num, mod)[1] + mod) % mod
+    return pow(num, -1, mod)
 
 
-def rsa(text : int | list[int], key : tuple[int]) -> int | list[int]:
+def lehmerModularInverse(num : int, mod : int) -> int:
+    """
+    Computes the inverse of a number modolu another number with Lehmer's variant of the extended euklidian algorithm.
+
+    As long as the numbers are big, the quotients are computed from their leading 64 bits only. The small
+    steps are collected in a 2x2 matrix which is applied to the big numbers (and the cofactors) at once.
+    That saves most of the operations on big numbers.
+
+    Args:
+        num (int): The number that should be inverted.
+        mod (int): The modulus.
+
+    Raises:
+        ValueError: If num is not invertible modulo mod.
+
+    Returns:
+        int: The inverse of num.
+    """
+    # a = x0 * num and b = x1 * num (mod mod)
+    a, b = mod, num % mod
+    x0, x1 = 0, 1
+
+    while b.bit_length() > 64:
+        shift = a.bit_length() - 64
+        aHigh, bHigh = a >> shift, b >> shift
+
+        # simulate euklid on the leading bits as long as the quotients are certainly right
+        A, B, C, D = 1, 0, 0, 1
+        while bHigh + C != 0 and bHigh + D != 0:
+            q = (aHigh + A) // (bHigh + C)
+            if q != (aHigh + B) // (bHigh + D):
+                break
+            A, C = C, A - q * C
+            B, D = D, B - q * D
+            aHigh, bHigh = bHigh, aHigh - q * bHigh
+
+        if B == 0:
+            # no step was certain, do one with the full numbers
+            q, r = divmod(a, b)
+            a, b = b, r
+            x0, x1 = x1, x0 - q * x1
+        else:
+            a, b = A * a + B * b, C * a + D * b
+            x0, x1 = A * x0 + B * x1, C * x0 + D * x1
+
+    # finish with the plain algorithm
+    while b != 0:
+        q, r = divmod(a, b)
+        a, b = b, r
+        x0, x1 = x1, x0 - q * x1
+
+    if a != 1:
+        raise ValueError(f"{num} is not invertible modulo {mod}")
+    return x0 % mod
+
+def batchModularInverse(nums : list[int], mod : int) -> list[int]:
+    """
+    Computes the inverses of many numbers modulo the same modulus with Montgomery's trick.
+
+    Only the product of all numbers gets inverted. The single inverses are recovered from it and the
+    prefix products, which costs 3 multiplications per number.
+
+    Args:
+        nums (list[int]): The numbers that should be inverted.
+        mod (int): The modulus.
+
+    Raises:
+        ValueError: If one of the numbers is not invertible modulo mod.
+
+    Returns:
+        list[int]: The inverses in the same order.
+    """
+    if len(nums) == 0:
+        return []
+
+    # prefixes[i] = nums[0] * ... * nums[i]
+    prefixes = [ nums[0] % mod ]
+    for num in nums[1:]:
+        prefixes.append((prefixes[-1] * num) % mod)
+
+    inverse = mudularInverse(prefixes[-1], mod)
+
+    inverses = [ 0 ] * len(nums)
+    for i in range(len(nums) - 1, 0, -1):
+        inverses[i] = (inverse * prefixes[i-1]) % mod
+        inverse = (inverse * nums[i]) % mod
+    inverses[0] = inverse
+    return inverses
+
+
+class PrivateKey(NamedTuple):
+    """
+    RSA private key that additionally keeps the values needed for decryption with the chinese remainder theorem.
+
+    The first two entries are (d, n), so it can be used everywhere a plain (d, n) tuple is expected.
+    Multi-prime keys keep every additional prime r_i as (r_i, d mod (r_i - 1), (p * q * r_3 * ... * r_(i-1))^-1 mod r_i) in otherPrimes.
+    """
+    d : int
+    n : int
+    p : int
+    q : int
+    dP : int    # d mod (p-1)
+    dQ : int    # d mod (q-1)
+    qInv : int  # q^-1 mod p
+    otherPrimes : tuple[tuple[int]] = ()
+
+def privateKeyFromFactors(d : int, p : int, q : int, otherPrimes : list[int] = []) -> PrivateKey:
+    """
+    Builds a private key including the chinese remainder theorem values.
+
+    Args:
+        d (int): Private exponent.
+        p (int): First prime factor of the modulus.
+        q (int): Second prime factor of the modulus.
+        otherPrimes (list[int], optional): Further prime factors of a multi-prime modulus. Defaults to [].
+
+    Returns:
+        PrivateKey: The private key.
+    """
+    product = p * q
+    otherPrimeInfos = []
+    for r in otherPrimes:
+        otherPrimeInfos.append((r, d % (r-1), mudularInverse(product, r)))
+        product *= r
+
+    return PrivateKey(d, product, p, q, d % (p-1), d % (q-1), mudularInverse(q, p), tuple(otherPrimeInfos))
+
+def rsaCRT(text : int, key : PrivateKey) -> int:
+    """
+    Performs the rsa decryption with the chinese remainder theorem.
+
+    Instead of one exponentiation mod n there is one per prime factor with a fraction of the size of modulus and exponent.
+    The results are recombined with Garner's formula: m = m2 + q * (qInv * (m1 - m2) mod p)
+    and for every further prime r_i: m = m + R * (t_i * (m_i - m) mod r_i) where R is the product of all previous primes.
+
+    Args:
+        text (int): The message.
+        key (PrivateKey): The private key.
+
+    Returns:
+        int: The decrypted message.
+    """
+    m1 = powWithMod(text, key.dP, key.p)
+    m2 = powWithMod(text, key.dQ, key.q)
+    h = (key.qInv * (m1 - m2)) % key.p
+    m = m2 + h * key.q
+
+    product = key.p * key.q
+    for r, dR, t in key.otherPrimes:
+        mR = powWithMod(text, dR, r)
+        h = (t * (mR - m)) % r
+        m += product * h
+        product *= r
+
+    return m
+
+def rsa(text : int | list[int], key : tuple[int] | PrivateKey) -> int | list[int]:
     """
     Performs the rsa encryption / decryption. (Depends on the given key)
 
     Args:
         text (int | list[int]): Either a message or a list of messages that should be encrypted. The message should be an integer. 
-        key (tuple[int]): Consists of (x, n) where n is the modulus and x is either the private or public key.
+        key (tuple[int] | PrivateKey): Consists of (x, n) where n is the modulus and x is either the private or public key.
+            If a PrivateKey is given, the decryption is done with the chinese remainder theorem.
 
     Returns:
         int | list[int]: The encrypted message(s).
     """
+    if isinstance(key, PrivateKey):
+        crypt = lambda t : rsaCRT(t, key)
+    else:
+        crypt = lambda t : powWithMod(t, key[0], key[1])
+
     if isinstance(text, list):
-        return [ powWithMod(t, key[0], key[1]) for t in text ]
+        return [ crypt(t) for t in text ]
     else:
-        return powWithMod(text, key[0], key[1])
+        return crypt(text)
+
+def totient(key : PrivateKey) -> int:
+    """
+    Computes phi(n) from the prime factors stored in a private key.
+
+    Args:
+        key (PrivateKey): The private key.
+
+    Returns:
+        int: phi(n)
+    """
+    phi = (key.p - 1) * (key.q - 1)
+    for r, _, _ in key.otherPrimes:
+        phi *= r - 1
+    return phi
+
+def fiatPublicExponents(key : PrivateKey, count : int) -> list[int]:
+    """
+    Finds the smallest odd primes that are valid public exponents for the modulus of the key.
+
+    Those can be handed out as distinct public keys (e_i, n) whose cryptotexts can be decrypted together with fiatBatchRsa.
+
+    Args:
+        key (PrivateKey): The private key.
+        count (int): How many exponents are needed.
+
+    Returns:
+        list[int]: Pairwise coprime public exponents.
+    """
+    phi = totient(key)
+    exponents = []
+    candidate = 3
+    while len(exponents) < count:
+        if all(candidate % e != 0 for e in exponents) and all(candidate % f != 0 for f in range(3, math.isqrt(candidate) + 1, 2)) and math.gcd(candidate, phi) == 1:
+            exponents.append(candidate)
+        candidate += 2
+    return exponents
+
+def fiatBatchRsa(texts : list[int], exponents : list[int], key : PrivateKey) -> list[int]:
+    """
+    Decrypts several messages that were encrypted under the same modulus but with distinct small public exponents (Fiat's batch RSA).
+
+    Instead of one full exponentiation per message there is only a single one for the whole batch:
+    For a batch S with E_S = product of its exponents let A_S = product of c_i^(E_S / e_i). Then A_S^(1/E_S) is the product M_S of all
+    messages. The product is split up again along a binary tree. For S = L + R take X with X = 1 mod E_L and X = 0 mod E_R, then
+    M_L = M_S^X / (A_R^(X / E_R) * A_L^((X-1) / E_L)) and M_R = M_S / M_L. All of these exponents are small.
+    Cryptotexts that are not invertible modulo n (eg. 0) are decrypted one by one with CRT.
+
+    Args:
+        texts (list[int]): The cryptotexts.
+        exponents (list[int]): The public exponent every cryptotext was encrypted with. They have to be pairwise coprime.
+        key (PrivateKey): The private key. Its factors are needed, the private exponent itself is not used.
+
+    Raises:
+        ValueError: If the exponents are not pairwise coprime.
+
+    Returns:
+        list[int]: The decrypted messages.
+    """
+    n = key.n
+    for i in range(len(exponents)):
+        for j in range(i):
+            if math.gcd(exponents[i], exponents[j]) != 1:
+                raise ValueError("Exponents of a batch have to be pairwise coprime")
+
+    phi = totient(key)
+    otherPrimes = [ r for r, _, _ in key.otherPrimes ]
+    keyFor = lambda e : privateKeyFromFactors(mudularInverse(e, phi), key.p, key.q, otherPrimes)
+
+    # cryptotexts sharing a factor with n (eg. 0) can't be divided by, they are decrypted one by one
+    messages = [ None ] * len(texts)
+    batch = []
+    for i, text in enumerate(texts):
+        if math.gcd(text, n) == 1:
+            batch.append(i)
+        else:
+            messages[i] = rsaCRT(text, keyFor(exponents[i]))
+
+    if len(batch) == 0:
+        return messages
+
+    # upwards: A and E for every node of the tree over the batch
+    nodes = {}
+    def product(lo : int, hi : int) -> tuple[int]:
+        if hi - lo == 1:
+            nodes[(lo, hi)] = (texts[batch[lo]] % n, exponents[batch[lo]])
+        else:
+            mid = (lo + hi) // 2
+            aL, eL = product(lo, mid)
+            aR, eR = product(mid, hi)
+            nodes[(lo, hi)] = ((powWithMod(aL, eR, n) * powWithMod(aR, eL, n)) % n, eL * eR)
+        return nodes[(lo, hi)]
+
+    # the single full size exponentiation
+    a, e = product(0, len(batch))
+    rootKey = keyFor(e)
+    
+    # downwards: split the products
+    def split(lo : int, hi : int, m : int):
+        if hi - lo == 1:
+            messages[batch[lo]] = m
+            return
+        
+        mid = (lo + hi) // 2
+        aL, eL = nodes[(lo, mid)]
+        aR, eR = nodes[(mid, hi)]
+        x = eR * mudularInverse(eR % eL, eL)
+
+        try:
+            denominator = (powWithMod(aR, x // eR, n) * powWithMod(aL, (x - 1) // eL, n)) % n
+            mL = (powWithMod(m, x, n) * pow(denominator, -1, n)) % n
+            mR = (m * pow(mL, -1, n)) % n
+        except ValueError:
+            # not invertible, decrypt the messages of this node one by one
+            for i in batch[lo:hi]:
+                messages[i] = rsaCRT(texts[i], keyFor(exponents[i]))
+            return
+        split(lo, mid, mL)
+        split(mid, hi, mR)
+
+    split(0, len(batch), rsaCRT(a, rootKey))
+    return messages
+
+# key of the batch worker processes. Set by initBatchWorker
+batchKey = None
+
+def initBatchWorker(key : tuple[int] | PrivateKey):
+    """
+    Sets up a batch worker process with the key and the context of its modulus.
+
+    Args:
+        key (tuple[int] | PrivateKey): The key that is used for all messages.
+    """
+    global batchKey
+    batchKey = key
+    getModContext(key[1])
+
+def rsaBatchChunk(texts : list[int], exponents : list[int] | None = None, fiatBatchSize : int = 8, key : tuple[int] | PrivateKey | None = None) -> list[int]:
+    """
+    Performs the rsa encryption / decryption of a chunk of messages.
+
+    Args:
+        texts (list[int]): The messages.
+        exponents (list[int] | None, optional): Public exponents of the messages for Fiat's batch RSA. Defaults to None.
+        fiatBatchSize (int, optional): Number of messages per batch of fiatBatchRsa. Defaults to 8.
+        key (tuple[int] | PrivateKey | None, optional): The key. Defaults to the key of the batch worker (see initBatchWorker).
+
+    Returns:
+        list[int]: The encrypted / decrypted messages.
+    """
+    key = batchKey if key is None else key
+    if exponents is None:
+        return rsa(texts, key)
+
+    result = []
+    for i in range(0, len(texts), fiatBatchSize):
+        result += fiatBatchRsa(texts[i : i+fiatBatchSize], exponents[i : i+fiatBatchSize], key)
+    return result
+
+def rsaBatch(texts : list[int], key : tuple[int] | PrivateKey, numProcesses : int | None = None, chunkSize : int = 64, exponents : list[int] | None = None, fiatBatchSize : int = 8) -> list[int]:
+    """
+    Performs the rsa encryption / decryption of many messages with a pool of processes.
+
+    The messages are sent to the workers in chunks. Every worker gets the key (and sets up the modulus context) only once.
+    If exponents are given, the messages are decrypted in batches of fiatBatchSize with Fiat's batch RSA (see fiatBatchRsa).
+
+    Args:
+        texts (list[int]): The messages.
+        key (tuple[int] | PrivateKey): The key. See rsa. Has to be a PrivateKey if exponents are given.
+        numProcesses (int | None, optional): Number of worker processes. Defaults to the number of CPUs.
+        chunkSize (int, optional): Number of messages sent to a worker at once. Should be a multiple of fiatBatchSize. Defaults to 64.
+        exponents (list[int] | None, optional): Public exponents the messages were encrypted with. Every consecutive fiatBatchSize of them have to be pairwise coprime. Defaults to None.
+        fiatBatchSize (int, optional): Number of messages per batch of fiatBatchRsa. Defaults to 8.
+
+    Returns:
+        list[int]: The encrypted / decrypted messages.
+    """
+    chunks = [ texts[i : i+chunkSize] for i in range(0, len(texts), chunkSize) ]
+    exponentChunks = [ None ] * len(chunks) if exponents is None else [ exponents[i : i+chunkSize] for i in range(0, len(exponents), chunkSize) ]
+
+    # not worth starting processes. The key is passed directly, the global batchKey is only for worker processes
+    if len(chunks) <= 1 or numProcesses == 1:
+        return rsaBatchChunk(texts, exponents, fiatBatchSize, key)
+
+    with ProcessPoolExecutor(numProcesses, initializer=initBatchWorker, initargs=(key, )) as executor:
+        results = executor.map(rsaBatchChunk, chunks, exponentChunks, [ fiatBatchSize ] * len(chunks))
+        return [ t for chunk in results for t in chunk ]
+
+
+def benchmarkPowWithMod(sizes : list[int] = [512, 1024, 2048, 4096], repetitions : int = 3):
+    """
+    Compares the exponentiation methods for random full size exponents and odd moduli and prints the average times.
+
+    Args:
+        sizes (list[int], optional): Bit sizes of modulus and exponent. Defaults to [512, 1024, 2048, 4096].
+        repetitions (int, optional): Exponentiations per size and method. Defaults to 3.
+    """
+    print("bits  " + "".join("{:>14}".format(method) for method in ModContext.METHODS[1:]))
+    for bits in sizes:
+        mod = random.getrandbits(bits) | (1 << (bits - 1)) | 1
+        args = [ (random.randrange(mod), random.getrandbits(bits)) for _ in range(repetitions) ]
+
+        times = []
+        for method in ModContext.METHODS[1:]:
+            start = time.perf_counter()
+            for base, exponent in args:
+                powWithMod(base, exponent, mod, method)
+            times.append((time.perf_counter() - start) / repetitions)
+
+        print("{:<6}".format(bits) + "".join("{:>12.3f}ms".format(1000 * t) for t in times))
+
+
+def benchmarkModularInverse(sizes : list[int] = [160, 512, 1024, 2048, 4096], repetitions : int = 50, batchSize : int = 100):
+    """
+    Compares the extended euklidian algorithm, Lehmer's variant, the builtin pow and the batch inversion and prints the average time per inversion.
+
+    Args:
+        sizes (list[int], optional): Bit sizes of the modulus. Defaults to [160, 512, 1024, 2048, 4096].
+        repetitions (int, optional): Inversions per size and method. Defaults to 50.
+        batchSize (int, optional): Numbers per batch of the batch inversion. Defaults to 100.
+    """
+    methods = {
+        "euklid" : lambda nums, mod : [ (extendedEucildianAlgorithm(num, mod)[1] + mod) % mod for num in nums ],
+        "lehmer" : lambda nums, mod : [ lehmerModularInverse(num, mod) for num in nums ],
+        "builtin" : lambda nums, mod : [ pow(num, -1, mod) for num in nums ],
+        "batch" : lambda nums, mod : [ inv for i in range(0, len(nums), batchSize) for inv in batchModularInverse(nums[i : i+batchSize], mod) ],
+    }
+
+    print("bits  " + "".join("{:>12}".format(method) for method in methods))
+    for bits in sizes:
+        mod = random.getrandbits(bits) | (1 << (bits - 1)) | 1
+        nums = []
+        while len(nums) < max(repetitions, batchSize):
+            num = random.randrange(1, mod)
+            if math.gcd(num, mod) == 1:
+                nums.append(num)
+
+        times = []
+        for invert in methods.values():
+            start = time.perf_counter()
+            invert(nums, mod)
+            times.append((time.perf_counter() - start) / len(nums))
+
+        print("{:<6}".format(bits) + "".join("{:>10.1f}us".format(1000000 * t) for t in times))
 
 
 if __name__ == "__main__":
@@ -99,5 +841,8 @@ if __name__ == "__main__":
     # inverse checks out :)
     print((encryptKey[0] * decryptKey[0]) % (10 * 6))
 
+    benchmarkPowWithMod()
+    benchmarkModularInverse()
+
 
 
@@ -1,67 +1,228 @@
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor, as_completed
+from functools import lru_cache
+import math
+import multiprocessing
 import random
+import threading
+import time
 
 rsa = __import__("06_rsa")
 
-def doMillerRabin(n : int) -> bool:
+# (bound, bases): for all n < bound miller rabin with these bases is deterministic
+DETERMINISTIC_BASES = [
+    (2047, [2]),
+    (1373653, [2, 3]),
+    (25326001, [2, 3, 5]),
+    (3215031751, [2, 3, 5, 7]),
+    (2152302898747, [2, 3, 5, 7, 11]),
+    (3474749660383, [2, 3, 5, 7, 11, 13]),
+    (341550071728321, [2, 3, 5, 7, 11, 13, 17]),
+    (3825123056546413051, [2, 3, 5, 7, 11, 13, 17, 19, 23]),
+    (318665857834031151167461, [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37]),
+    (3317044064679887385961981, [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]),
+]
+
+# (minimal bit length, rounds): rounds with random bases such that a random candidate passes with probability below 2^-80 (HAC table 4.4)
+ROUNDS_BY_BITS = [ (1300, 2), (850, 3), (650, 4), (550, 5), (450, 6), (400, 7), (350, 8), (300, 9), (250, 12), (200, 15), (150, 18), (0, 27) ]
+
+def decompose(n : int) -> tuple[int]:
     """
-    Does one iteration of the miller rabin test.
+    Writes n - 1 = m * 2^k with an odd m.
 
     Args:
-        n (int): The value that will be checked against.
+        n (int): An odd number.
 
     Returns:
-        bool: Returns whether this iteration of the test thinks that n is prime. If false is returned, n is defenitely not prime. If true, it might still be compound.
+        tuple[int]: m, k
     """
-    # discard even inputs
-    if n % 2 == 0:
-        return False
-
-    # calculate m and k
     m = n - 1
-    k = 0
-    while m & 1 == 0 and m > 1:
-        k += 1
-        m >>= 1
+    k = (m & -m).bit_length() - 1
+    return m >> k, k
 
-    # choose a
-    a = random.randrange(1, n)
+def millerRabinRound(n : int, m : int, k : int, a : int) -> bool:
+    """
+    Does one iteration of the miller rabin test with a given decomposition n - 1 = m * 2^k.
+
+    Args:
+        n (int): The value that will be checked against. Has to be odd and greater than 2.
+        m (int): Odd part of n - 1.
+        k (int): Exponent of 2 in n - 1.
+        a (int): The base.
+
+    Returns:
+        bool: Whether this iteration thinks that n is prime. (See doMillerRabin)
+    """
     b = rsa.powWithMod(a, m, n)
 
-    if b == 1:
+    if b == 1 or b == n-1:
         return True
 
     # check all powers
-    for _ in range(k):
+    for _ in range(k - 1):
+        b = (b * b) % n
         if b == n-1:
             return True
-        else:
-            b = (b * b) % n
     
     return False
 
-def checkPrime(n : int, numTries : int = 15) -> bool:
+def doMillerRabin(n : int, a : int | None = None) -> bool:
+    """
+    Does one iteration of the miller rabin test.
+
+    Args:
+        n (int): The value that will be checked against.
+        a (int | None, optional): The base. Defaults to a random one.
+
+    Returns:
+        bool: Returns whether this iteration of the test thinks that n is prime. If false is returned, n is defenitely not prime. If true, it might still be compound.
+    """
+    # discard even inputs
+    if n % 2 == 0:
+        return n == 2
+    if n < 5:
+        return n == 3
+
+    # choose a
+    if a is None:
+        a = random.randrange(2, n-1)
+
+    m, k = decompose(n)
+    return millerRabinRound(n, m, k, a % n) if a % n != 0 else True
+
+def millerRabinBases(n : int, numTries : int | None = None) -> list[int]:
+    """
+    Chooses the bases for the miller rabin test of n.
+
+    Below 3.3*10^24 fixed bases make the test deterministic. Above, base 2 is followed by random bases.
+
+    Args:
+        n (int): The value that will be checked. Has to be greater than 4.
+        numTries (int | None, optional): Number of bases for big n. Defaults to a number depending on the bit length (see ROUNDS_BY_BITS).
+
+    Returns:
+        list[int]: The bases.
+    """
+    for bound, bases in DETERMINISTIC_BASES:
+        if n < bound:
+            return bases
+
+    if numTries is None:
+        numTries = next(rounds for minBits, rounds in ROUNDS_BY_BITS if n.bit_length() >= minBits)
+    return [ 2 ] + [ random.randrange(3, n-1) for _ in range(numTries - 1) ]
+
+def checkPrime(n : int, numTries : int | None = None) -> bool:
     """
     Checks whether n is prime by performing miller rabin multiple times.
 
+    Small prime factors are ruled out by trial division first. The decomposition of n - 1 is only computed once and the
+    test stops at the first witness. Below 3.3*10^24 the result is always correct.
+
     A return value of false is always coorect while a true might be falsed (although that is really unlikely)
 
     Args:
         n (int):  The value that will be checked against its primness.
-        numTries (int, optional): How many times should miller rabin be executed. Defaults to 15.
+        numTries (int | None, optional): How many times should miller rabin be executed for n above 3.3*10^24. Defaults to a number depending on the bit length (see ROUNDS_BY_BITS).
+
+    Returns:
+        bool: Whether n is (probably) prime.
+    """
+    if n < 2:
+        return False
+    for p in SMALL_PRIMES[:25]:
+        if n % p == 0:
+            return n == p
+    if n < SMALL_PRIMES[24] ** 2:
+        return True
+
+    m, k = decompose(n)
+    return all(millerRabinRound(n, m, k, a) for a in millerRabinBases(n, numTries))
+
+def checkPrimes(candidates : list[int], numTries : int | None = None) -> list[bool]:
+    """
+    Checks a list of candidates for primality. (See checkPrime)
+
+    The candidates are tested round by round, so every further round only runs on the candidates that are left.
+
+    Args:
+        candidates (list[int]): The values that will be checked.
+        numTries (int | None, optional): See checkPrime.
 
     Returns:
-        bool: _description_
+        list[bool]: Whether each candidate is (probably) prime.
     """
-    for _ in range(numTries):
-        if not doMillerRabin(n):
-            return False
-    return True
+    results = [ False ] * len(candidates)
+    remaining = []
+    for index, n in enumerate(candidates):
+        if n < 2:
+            continue
+        divisor = next((p for p in SMALL_PRIMES[:25] if n % p == 0), None)
+        if divisor is not None or n < SMALL_PRIMES[24] ** 2:
+            results[index] = n == divisor or divisor is None
+        else:
+            m, k = decompose(n)
+            remaining.append((index, n, m, k, millerRabinBases(n, numTries)))
+
+    round = 0
+    while len(remaining) > 0:
+        survivors = []
+        for index, n, m, k, bases in remaining:
+            if not millerRabinRound(n, m, k, bases[round]):
+                continue
+            if round + 1 == len(bases):
+                results[index] = True
+            else:
+                survivors.append((index, n, m, k, bases))
+        remaining = survivors
+        round += 1
+
+    return results
 
+def sievePrimes(limit : int) -> list[int]:
+    """
+    Finds all primes below limit with the sieve of eratosthenes.
+
+    Args:
+        limit (int): Upper bound (exclusive).
+
+    Returns:
+        list[int]: All primes below limit.
+    """
+    isPrime = bytearray([1]) * limit
+    isPrime[:2] = b"\x00\x00"
+    for p in range(2, math.isqrt(limit - 1) + 1):
+        if isPrime[p]:
+            isPrime[p*p::p] = bytes(len(range(p*p, limit, p)))
+    return [ p for p in range(limit) if isPrime[p] ]
+
+# primes used to sieve out prime candidates
+SMALL_PRIMES = sievePrimes(1 << 14)
+
+def sieveWindow(start : int, length : int) -> bytearray:
+    """
+    Marks all numbers in start, ..., start + length - 1 that have a prime factor in SMALL_PRIMES (and are not that prime).
+
+    Args:
+        start (int): First number of the window.
+        length (int): Length of the window.
+
+    Returns:
+        bytearray: 1 at index i if start + i survived the sieve, 0 otherwise.
+    """
+    survivors = bytearray([1]) * length
+    for p in SMALL_PRIMES:
+        first = max(p * p, -(-start // p) * p)
+        if first - start < length:
+            survivors[first - start::p] = bytes(len(range(first - start, length, p)))
+    return survivors
 
 def getNextPrime(start : int) -> int:
     """
     Returns the next prime after start. Start has to be divisible by 30.
 
+    The numbers after start are sieved in windows with all small primes. Only the survivors are tested
+    with checkPrime, which starts with a cheap miller rabin iteration to base 2.
+
     Args:
         start (int): The value where the searching starts. It has to be divisible by 30.
 
@@ -75,65 +236,577 @@ def getNextPrime(start : int) -> int:
     if start % 30 != 0:
         raise ValueError("Start has to be divisble by 30")
 
-    offsets = [1, 7, 11, 13, 17, 19, 23, 29]
-    for offset in offsets:
-        if checkPrime(start + offset):
-            return start + offset
-    return getNextPrime(start + 30)
+    # the average gap between primes is about 0.7 * bit length
+    windowLength = max(1024, 8 * start.bit_length())
+    windowStart = start + 1
+    while True:
+        survivors = sieveWindow(windowStart, windowLength)
+        for i in range(0, windowLength, 2):
+            candidate = windowStart + i
+            if survivors[i] and checkPrime(candidate):
+                return candidate
+        windowStart += windowLength
 
-def genKey() -> tuple[tuple[int]]:
+def genKey(numPrimes : int = 2) -> tuple[tuple[int]]:
     """
     Generates a RSA key pair.
 
+    With more than two primes the modulus has about the same size but consists of smaller primes.
+    Those are faster to find and make the decryption with the chinese remainder theorem faster.
+
+    Args:
+        numPrimes (int, optional): Number of prime factors of the modulus. Should be 2, 3 or 4. Defaults to 2.
+
+    Raises:
+        ValueError: If numPrimes is smaller than 2.
+
     Returns:
-        tuple[tuple[int]]: Returns tuple of public and private keys.
+        tuple[tuple[int]]: Returns tuple of public and private keys. The private key is a rsa.PrivateKey, so the decryption uses the chinese remainder theorem.
     """
-    # generate p
-    z = random.randrange(10**100, 10**101)
-    p = getNextPrime(30 * z)
+    if numPrimes < 2:
+        raise ValueError("A RSA modulus needs at least 2 primes")
+
+    # generate the primes such that the modulus has about 200 digits
+    digits = 200 // numPrimes
+    primes = []
+    while len(primes) < numPrimes:
+        z = random.randrange(10**digits, 10**(digits+1))
+        prime = getNextPrime(30 * z)
+        if prime not in primes:
+            primes.append(prime)
+
+    n = 1
+    phi = 1
+    for prime in primes:
+        n *= prime
+        phi *= prime - 1
+
+    # generate d (For a prime d > max{p_i} we get gcd(d, phi(n)) = 1)
+    # it also stays above sqrt(n) for multi-prime moduli, so it doesn't get too small
+    d = getNextPrime(30 * (max(max(primes), math.isqrt(n)) // 30 + 1))
     
-    # generate q
-    z = random.randrange(10**100, 10**101)
-    q = getNextPrime(30 * z)
+    e = rsa.mudularInverse(d, phi)
+    return ((e, n), rsa.privateKeyFromFactors(d, primes[0], primes[1], primes[2:]))
+
+def genKeyParallel(numPrimes : int = 2, executor : ProcessPoolExecutor | None = None) -> tuple[tuple[int]]:
+    """
+    Generates a RSA key pair like genKey but searches all primes and d at the same time in a pool of processes.
+
+    As d can't wait for the primes, it is searched above the biggest possible prime (and the square root of the biggest possible modulus).
+
+    Args:
+        numPrimes (int, optional): Number of prime factors of the modulus. Should be 2, 3 or 4. Defaults to 2.
+        executor (ProcessPoolExecutor | None, optional): The pool to use. Defaults to a new pool that is closed afterwards.
+
+    Raises:
+        ValueError: If numPrimes is smaller than 2.
+
+    Returns:
+        tuple[tuple[int]]: Returns tuple of public and private keys. (See genKey)
+    """
+    if numPrimes < 2:
+        raise ValueError("A RSA modulus needs at least 2 primes")
+    if executor is None:
+        with ProcessPoolExecutor(numPrimes + 1) as executor:
+            return genKeyParallel(numPrimes, executor)
+
+    # same sizes as in genKey
+    digits = 200 // numPrimes
+    dMin = math.isqrt((30 * 10**(digits+1)) ** numPrimes) // 30 + 1
+
+    primeFutures = [ executor.submit(getNextPrime, 30 * random.randrange(10**digits, 10**(digits+1))) for _ in range(numPrimes) ]
+    dFuture = executor.submit(getNextPrime, 30 * random.randrange(dMin, 2 * dMin))
+
+    primes = []
+    for future in primeFutures:
+        prime = future.result()
+        while prime in primes:
+            prime = getNextPrime(30 * random.randrange(10**digits, 10**(digits+1)))
+        primes.append(prime)
+    d = dFuture.result()
+
+    n = 1
+    phi = 1
+    for prime in primes:
+        n *= prime
+        phi *= prime - 1
+
+    # only fails if a prime ended up above d
+    while math.gcd(d, phi) != 1:
+        d = getNextPrime(30 * (d // 30 + 1))
+
+    e = rsa.mudularInverse(d, phi)
+    return ((e, n), rsa.privateKeyFromFactors(d, primes[0], primes[1], primes[2:]))
+
+class KeyPool:
+    """
+    Pool of ready-made RSA key pairs, so that a key pair is available instantly.
+
+    A background thread refills the pool up to size whenever fewer than watermark key pairs are left.
+    The keys are generated with genKeyParallel in a pool of processes. Every key pair is handed out only once.
+    Call close (or use the pool in a with statement) when it is not needed anymore.
+    """
+
+    def __init__(self, size : int = 10, watermark : int | None = None, numPrimes : int = 2, numProcesses : int | None = None):
+        """
+        Creates the pool and starts the background thread.
+
+        Args:
+            size (int, optional): Number of key pairs the pool is refilled to. Defaults to 10.
+            watermark (int | None, optional): Refill as soon as fewer key pairs are left. Has to be between 1 and size. Defaults to max(1, size // 2).
+            numPrimes (int, optional): Number of prime factors of the moduli. Defaults to 2.
+            numProcesses (int | None, optional): Number of processes searching primes. Defaults to the number of CPUs.
+
+        Raises:
+            ValueError: If the watermark is not between 1 and size.
+        """
+        self.size = size
+        self.watermark = max(1, size // 2) if watermark is None else watermark
+        if not 1 <= self.watermark <= size:
+            raise ValueError("Watermark has to be between 1 and size")
+        self.numPrimes = numPrimes
+        self.keys = deque()
+        self.condition = threading.Condition()
+        self.stopped = False
+
+        # metrics
+        self.numGenerated = 0
+        self.numTaken = 0
+        self.numMisses = 0
+        self.refillSeconds = 0.0
+
+        self.executor = ProcessPoolExecutor(numProcesses)
+        self.thread = threading.Thread(target=self.refillLoop, daemon=True)
+        self.thread.start()
+
+    def refillLoop(self):
+        """
+        Body of the background thread. Fills the pool and then waits until it drops below the watermark to fill it again.
+        """
+        while True:
+            while True:
+                with self.condition:
+                    if self.stopped or len(self.keys) >= self.size:
+                        break
+                start = time.perf_counter()
+                try:
+                    key = genKeyParallel(self.numPrimes, self.executor)
+                except (RuntimeError, CancelledError):
+                    # the process pool was shut down, eg. at interpreter shutdown without close
+                    with self.condition:
+                        self.stopped = True
+                        self.condition.notify_all()
+                    return
+                with self.condition:
+                    self.keys.append(key)
+                    self.numGenerated += 1
+                    self.refillSeconds += time.perf_counter() - start
+                    self.condition.notify_all()
+
+            with self.condition:
+                self.condition.wait_for(lambda : self.stopped or len(self.keys) < self.watermark)
+                if self.stopped:
+                    return
+
+    def genKey(self) -> tuple[tuple[int]]:
+        """
+        Takes a key pair from the pool. If the pool is empty, a new one is generated right away.
+
+        Returns:
+            tuple[tuple[int]]: Returns tuple of public and private keys. (See genKey)
+        """
+        with self.condition:
+            self.numTaken += 1
+            key = self.keys.popleft() if len(self.keys) > 0 else None
+            if key is None:
+                self.numMisses += 1
+            self.condition.notify_all()
+        return key if key is not None else genKeyParallel(self.numPrimes, self.executor)
+
+    def metrics(self) -> dict:
+        """
+        Returns the current metrics of the pool.
+
+        Returns:
+            dict: depth (key pairs in the pool), generated, taken, misses (key pairs generated on demand), refillRate (key pairs per second while refilling)
+        """
+        with self.condition:
+            return {
+                "depth" : len(self.keys),
+                "generated" : self.numGenerated,
+                "taken" : self.numTaken,
+                "misses" : self.numMisses,
+                "refillRate" : self.numGenerated / self.refillSeconds if self.refillSeconds > 0 else 0.0,
+            }
+
+    def close(self):
+        """
+        Stops the background thread and the process pool.
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.executor.shutdown()
+
+    def __enter__(self) -> 'KeyPool':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+# moduli for the quadratic residue filter of findFactors
+FERMAT_MODULI = [ 64, 63, 65, 11, 17, 19, 23 ]
+
+def fermatSearch(n : int, maxIterations : int | None = None, batchSize : int = 1 << 14) -> tuple[int] | None:
+    """
+    Searches the smallest u >= sqrt(n) such that u² - n is a perfect square.
+
+    The values of u are handled in blocks of batchSize. In every block all u for which u² - n is not a square modulo
+    one of the FERMAT_MODULI are sieved out, so only few candidates need an (integer) square root.
+
+    Args:
+        n (int): The number.
+        maxIterations (int | None, optional): How many values of u may be tried. Defaults to no limit.
+        batchSize (int, optional): Number of values of u per block. Defaults to 2^14.
+
+    Returns:
+        tuple[int] | None: (u, w) with u² - n = w² or None if there is none within maxIterations.
+    """
+    u0 = math.isqrt(n)
+    if u0 * u0 < n:
+        u0 += 1
+
+    # residues of u modulo M for which u² - n can't be a square
+    filters = []
+    for M in FERMAT_MODULI:
+        squares = { (x * x) % M for x in range(M) }
+        filters.append((M, [ r for r in range(M) if (r * r - n) % M not in squares ]))
 
-    # generate d (For a prime d > max{p, q} we get gcd(d, phi(n)) = 1)
-    d = getNextPrime(30 * (max(p, q) // 30 + 1))
+    tried = 0
+    while maxIterations is None or tried < maxIterations:
+        length = batchSize if maxIterations is None else min(batchSize, maxIterations - tried)
+        start = u0 + tried
+
+        candidates = bytearray([1]) * length
+        for M, invalid in filters:
+            for r in invalid:
+                first = (r - start) % M
+                candidates[first::M] = bytes(len(range(first, length, M)))
+
+        i = candidates.find(1)
+        while i != -1:
+            u = start + i
+            w = math.isqrt(u * u - n)
+            if w * w == u * u - n:
+                return u, w
+            i = candidates.find(1, i + 1)
+
+        tried += length
     
-    e = rsa.mudularInverse(d, (p-1)*(q-1))
-    n = p * q
-    return ((e, n), (d, n))
+    return None
 
-def findFactors(n : int) -> tuple[int]:
+def findFactors(n : int, maxIterations : int | None = None, batchSize : int = 1 << 14, multipliers : list[int] = [1]) -> tuple[int] | None:
     """
-    Tries to find the factors of a number assuming they are close by. If they are not, the search will take forever.
+    Tries to find the factors of a number assuming they are close by. If they are not, the search takes very long
+    without a limit. With maxIterations it gives up and returns None instead.
 
     The used method is the difference of squares:
         Assume: n = (u-d)*(u+d) = u² - d² <=> d² = u² - n
         => If we find a u such that u² - n is a perfect square, we found our p = u-d, q = u+d such that n = p*q
 
+    The search for u is done by fermatSearch. If the ratio of the factors is close to a small fraction a/b,
+    the difference of squares finds the close factors a*q and b*p of 4*k*n for the multiplier k = a*b (Lehman).
+
     Args:
         n (int): The number that shoule factored
+        maxIterations (int | None, optional): How many values of u may be tried per multiplier. Defaults to no limit.
+        batchSize (int, optional): Number of values of u per block. Defaults to 2^14.
+        multipliers (list[int], optional): The multipliers k that are tried one after another. Defaults to [1].
+
+    Returns:
+        tuple[int] | None: The factors of n, the bigger one first. None if they weren't found within maxIterations.
+    """
+    if n % 2 == 0:
+        return n // 2, 2
+
+    for k in multipliers:
+        if k == 1:
+            found = fermatSearch(n, maxIterations, batchSize)
+            if found is not None:
+                u, w = found
+                return (u+w, u-w)
+        else:
+            found = fermatSearch(4 * k * n, maxIterations, batchSize)
+            if found is not None:
+                u, w = found
+                factor = math.gcd(u - w, n)
+                if 1 < factor < n:
+                    return (max(factor, n // factor), min(factor, n // factor))
+
+    return None
+    
+def pollardRho(n : int, c : int | None = None, x0 : int | None = None, batchSize : int = 128, maxIterations : int | None = None, stopEvent : threading.Event | None = None) -> int | None:
+    """
+    Tries to find a factor of n with Pollard's rho method and Brent's cycle detection.
+
+    The walk x -> x² + c mod n becomes periodic modulo every prime factor p after about sqrt(p) steps.
+    Brent's method compares x with the values in growing windows and the differences are multiplied
+    together, so there is only one gcd per batchSize steps.
+
+    Args:
+        n (int): The number that should be factored. Should be composite.
+        c (int | None, optional): Constant of the walk. Defaults to a random one.
+        x0 (int | None, optional): Start value of the walk. Defaults to a random one.
+        batchSize (int, optional): Number of steps per gcd. Defaults to 128.
+        maxIterations (int | None, optional): Maximal number of steps. It is checked after every batch. Defaults to no limit.
+        stopEvent (threading.Event | None, optional): The walk stops within one batch after it is set. Defaults to None.
+
+    Returns:
+        int | None: A non trivial factor of n or None if the walk failed (or was stopped).
+    """
+    if n % 2 == 0:
+        return 2
+    if c is None:
+        c = random.randrange(1, n-1)
+    if x0 is None:
+        x0 = random.randrange(0, n)
+
+    stopped = lambda : (maxIterations is not None and steps >= maxIterations) or (stopEvent is not None and stopEvent.is_set())
+
+    # the stop conditions are checked once per batch, as r grows to millions of steps
+    y, r, q, g = x0, 1, 1, 1
+    steps = 0
+    while g == 1:
+        x = y
+        k = 0
+        while k < r:
+            if stopped():
+                return None
+            numSteps = min(batchSize, r - k)
+            for _ in range(numSteps):
+                y = (y * y + c) % n
+            k += numSteps
+            steps += numSteps
+
+        k = 0
+        while k < r and g == 1:
+            if stopped():
+                return None
+            ys = y
+            numSteps = min(batchSize, r - k)
+            for _ in range(numSteps):
+                y = (y * y + c) % n
+                q = (q * (x - y)) % n
+            g = math.gcd(q, n)
+            k += numSteps
+            steps += numSteps
+        r *= 2
+
+    # the batch jumped over the factor, redo its steps one by one
+    if g == n:
+        while True:
+            ys = (ys * ys + c) % n
+            g = math.gcd(x - ys, n)
+            if g > 1:
+                break
+
+    return g if g != n else None
+
+# stop event of the rho worker processes. Set by initRhoWorker
+rhoStopEvent = None
+
+def initRhoWorker(stopEvent):
+    """
+    Sets up a worker process of pollardRhoParallel.
+
+    Args:
+        stopEvent: Event shared by all workers that is set when a factor was found.
+    """
+    global rhoStopEvent
+    rhoStopEvent = stopEvent
+
+def rhoWalk(n : int, batchSize : int) -> int | None:
+    """
+    Does random rho walks in a worker process until one finds a factor or the stop event is set.
+
+    Args:
+        n (int): The number that should be factored.
+        batchSize (int): See pollardRho.
 
     Returns:
-        tuple[int]: The factors of n.
+        int | None: A non trivial factor of n or None if it was stopped.
     """
-    isSquare = lambda x : int(x**0.5)**2 == x
+    while not rhoStopEvent.is_set():
+        factor = pollardRho(n, batchSize=batchSize, stopEvent=rhoStopEvent)
+        if factor is not None:
+            rhoStopEvent.set()
+            return factor
+    return None
 
-    u = int(n**0.5) + 1
-    while not isSquare(u**2-n):
-        u += 1
+def pollardRhoParallel(n : int, numProcesses : int | None = None, batchSize : int = 128) -> int:
+    """
+    Runs independent rho walks with random constants in a pool of processes. The first factor found stops all other walks.
 
-    w = int((u**2-n)**0.5)
+    Args:
+        n (int): The number that should be factored. Has to be composite.
+        numProcesses (int | None, optional): Number of processes. Defaults to the number of CPUs.
+        batchSize (int, optional): See pollardRho. Defaults to 128.
+
+    Returns:
+        int: A non trivial factor of n.
+    """
+    numProcesses = numProcesses or multiprocessing.cpu_count()
+    stopEvent = multiprocessing.Event()
+    with ProcessPoolExecutor(numProcesses, initializer=initRhoWorker, initargs=(stopEvent, )) as executor:
+        futures = [ executor.submit(rhoWalk, n, batchSize) for _ in range(numProcesses) ]
+        for future in as_completed(futures):
+            if future.result() is not None:
+                # the other walks see the event within one batch, so leaving the executor doesn't block
+                stopEvent.set()
+                return future.result()
+
+@lru_cache(maxsize=4)
+def primePowerProduct(bound : int) -> int:
+    """
+    Computes the product of the highest powers of all primes that are at most bound. (The exponent of stage 1 of pollardPMinus1)
+
+    Args:
+        bound (int): The smoothness bound.
+
+    Returns:
+        int: The product.
+    """
+    product = 1
+    for p in sievePrimes(bound + 1):
+        product *= p ** int(math.log(bound, p))
+    return product
+
+def pollardPMinus1(n : int, bound : int = 10**5, bound2 : int | None = None) -> int | None:
+    """
+    Tries to find a factor of n with Pollard's p-1 method.
 
-    return (u+w, u-w)
+    If p - 1 only has prime power factors up to bound for a prime factor p of n, then a^E = 1 mod p for the
+    product E of all those prime powers, so gcd(a^E - 1, n) reveals p. In stage 2 also a single additional
+    prime factor of p - 1 up to bound2 is allowed.
+
+    Args:
+        n (int): The number that should be factored.
+        bound (int, optional): Smoothness bound of stage 1. Defaults to 10**5.
+        bound2 (int | None, optional): Bound of stage 2. Defaults to 100 * bound. 0 skips stage 2.
+
+    Returns:
+        int | None: A non trivial factor of n or None if it wasn't found.
+    """
+    if n % 2 == 0:
+        return 2
+    bound2 = 100 * bound if bound2 is None else bound2
+
+    # stage 1
+    a = rsa.powWithMod(2, primePowerProduct(bound), n)
+    g = math.gcd(a - 1, n)
+    if 1 < g < n:
+        return g
+    if g == n:
+        # all prime factors were found at once, go through the primes one by one instead
+        a = 2
+        for p in sievePrimes(bound + 1):
+            for _ in range(int(math.log(bound, p))):
+                a = rsa.powWithMod(a, p, n)
+                g = math.gcd(a - 1, n)
+                if 1 < g < n:
+                    return g
+                if g == n:
+                    return None
+        return None
+
+    # stage 2: a^q for the primes bound < q <= bound2, stepping with the (small, even) prime gaps
+    if bound2 <= bound:
+        return None
+    primes = [ q for q in sievePrimes(bound2 + 1) if q > bound ]
+    if len(primes) == 0:
+        return None
+    
+    gapPowers = {}
+    x = rsa.powWithMod(a, primes[0], n)
+    product = (x - 1) % n
+    for previous, q in zip(primes, primes[1:]):
+        gap = q - previous
+        if gap not in gapPowers:
+            gapPowers[gap] = rsa.powWithMod(a, gap, n)
+        x = (x * gapPowers[gap]) % n
+        product = (product * (x - 1)) % n
     
+    g = math.gcd(product, n)
+    return g if 1 < g < n else None
+
+def factorize(n : int, numProcesses : int = 1) -> list[int]:
+    """
+    Finds all prime factors of n with trial division, Pollard's p-1 method and Pollard's rho method.
+
+    Args:
+        n (int): The number that should be factored.
+        numProcesses (int, optional): Number of processes for the rho walks. Defaults to 1.
+
+    Returns:
+        list[int]: The sorted prime factors (with multiplicity).
+    """
+    factors = []
+    for p in SMALL_PRIMES:
+        while n % p == 0:
+            factors.append(p)
+            n //= p
+
+    remaining = [ n ] if n > 1 else []
+    while len(remaining) > 0:
+        m = remaining.pop()
+        if checkPrime(m):
+            factors.append(m)
+            continue
+
+        factor = pollardPMinus1(m, 10**4, 10**5)
+        if factor is None:
+            factor = pollardRhoParallel(m, numProcesses) if numProcesses > 1 else None
+            while factor is None:
+                factor = pollardRho(m)
+        remaining += [ factor, m // factor ]
+
+    return sorted(factors)
+
 if __name__ == "__main__":
     (encryptKey, decryptKey) = genKey()
     cryptotext = rsa.rsa([12, 42, 1, 0, 76, 30], encryptKey)
     print(cryptotext)
     print(rsa.rsa(cryptotext, decryptKey))
 
+    # decryption with and without the chinese remainder theorem
+    for numPrimes in [2, 3, 4]:
+        start = time.perf_counter()
+        (encryptKey, decryptKey) = genKey(numPrimes)
+        print(f"\n{numPrimes} primes: {time.perf_counter() - start:.3f}s key generation")
+
+        cryptotext = rsa.rsa([12, 42, 1, 0, 76, 30] * 20, encryptKey)
+        for key in [ decryptKey, (decryptKey.d, decryptKey.n) ]:
+            start = time.perf_counter()
+            assert rsa.rsa(cryptotext, key) == [12, 42, 1, 0, 76, 30] * 20
+            print(f"{type(key).__name__}: {1000 * (time.perf_counter() - start) / len(cryptotext):.3f}ms per decryption")
+
+    # key pairs from a pool that is filled in the background
+    pool = KeyPool(4)
+    time.sleep(2)
+    start = time.perf_counter()
+    for _ in range(4):
+        (encryptKey, decryptKey) = pool.genKey()
+    print(f"\nKeyPool.genKey: {1000 * (time.perf_counter() - start) / 4:.3f}ms per key pair")
+    print(pool.metrics())
+    pool.close()
+
     print(findFactors(9854989 * 9857213))
     print(findFactors(9999749 * 3005293))
 
-    # print(findFactors(5000000037041 * 10000000058171))
+    print(findFactors(5000000037041 * 10000000058171, 10**5, multipliers=range(1, 10)))
+
+    # general factoring methods
+    print(pollardRho(9854989 * 9857213))
+    print(pollardPMinus1(8608456956238879741 * 1000000000000000000000000000057))
+    print(factorize(5000000037041 * 10000000058171 * 1000003 * 12))
@@ -1,6 +1,8 @@
 import random
 from typing import Callable
 
+import numpy as np
+
 rsa = __import__("06_rsa")
 keyGen = __import__("07_rsa_key_gen")
 sha1 = __import__("11_sha1")
@@ -75,6 +77,24 @@ def mgf1(seed : bytearray, length : int, hashfunction : Callable[[bytearray], by
     
     return T[:length]
 
+def mgf1Batch(seed : bytearray, length : int, batchHashfunction : Callable[[list[bytearray]], np.ndarray], digestLength : int = 20) -> bytearray:
+    """
+    Same as mgf1, but all inputs seed || counter are hashed with one call of a batched hashfunction (eg sha1.sha1Batch).
+
+    As all inputs have the same length, they are hashed in parallel lanes. This pays off for long masks.
+
+    Args:
+        seed (bytearray): The random seed used.
+        length (int): Desired output length
+        batchHashfunction (Callable[[list[bytearray]], np.ndarray]): Hashes a list of messages into a uint8 array with one digest per row.
+        digestLength (int, optional): Byte length of the digests. Defaults to 20 (sha1).
+
+    Returns:
+        bytearray: The generated mask.
+    """
+    inputs = [ seed + bytearray(counter.to_bytes(4, 'big')) for counter in range(1, length // digestLength + 2) ]
+    return bytearray(batchHashfunction(inputs).tobytes()[:length])
+
 def oaepTrafo(message : bytearray, n : int, hashfunction : Callable[[bytearray], bytearray], l : bytearray = bytearray()) -> bytearray:
     """
     Performs the OAEP-transformation. For detailed information see the draft in the beginning of the document.
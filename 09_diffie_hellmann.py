@@ -1,21 +1,55 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import asyncio
+import multiprocessing
 import random
+import threading
+import time
+
+import include.parameters as parameters
 
 rsa = __import__("06_rsa")
 rsa_key_gen = __import__("07_rsa_key_gen")
 
-def calcTransmitValue(p : int, g : int) -> tuple[int]:
+# exponent sizes of about twice the security level of the group (RFC 3526), (minimal modulus bits, exponent bits)
+SHORT_EXPONENT_BITS = [ (8192, 620), (6144, 540), (4096, 480), (3072, 420), (2048, 320), (1536, 240), (1024, 160) ]
+
+def shortExponentBits(p : int) -> int | None:
+    """
+    Returns the size of a short private exponent that keeps the security level of the group.
+
+    Discrete logarithms of an exponent with n bits can be computed in about 2^(n/2) steps, so an exponent of
+    twice the security level of the modulus is sufficient. This only holds if g generates a subgroup of prime
+    order (see subgroupGenerator), otherwise parts of the exponent leak through the small subgroups.
+
+    Args:
+        p (int): Modolus
+
+    Returns:
+        int | None: Bit length of the exponent or None if the group is too small to use short exponents.
+    """
+    for minBits, exponentBits in SHORT_EXPONENT_BITS:
+        if p.bit_length() >= minBits:
+            return exponentBits
+    return None
+
+def calcTransmitValue(p : int, g : int, exponentBits : int | None = None) -> tuple[int]:
     """
     Generates transmit value (= half key) and secret value from public values.
 
     Args:
         p (int): Modolus
         g (int): Generator (Base)
+        exponentBits (int | None, optional): Bit length of the private value. A short exponent (see shortExponentBits) makes both exponentiations
+            several times faster. Defaults to None, which uses the full range 2, ..., p-1.
 
     Returns:
         tuple[int]: transmit value (= half key), private value
     """
-    a = random.randint(2, p-1)
-    return rsa.powWithMod(g, a, p), a
+    if exponentBits is None:
+        a = random.randint(2, p-1)
+    else:
+        a = random.getrandbits(exponentBits) | (1 << (exponentBits - 1))
+    return rsa.getFixedBase(g, p).pow(a), a
 
 def calcSecretFromTransmitValue(transmitVal : int, p : int, a : int) -> int:
     """
@@ -31,7 +65,132 @@ def calcSecretFromTransmitValue(transmitVal : int, p : int, a : int) -> int:
     """
     return rsa.powWithMod(transmitVal, a, p)
 
-def genPublicValues(range : tuple[int] = (10**10, 10**20)) -> tuple[int]:
+# primes used to sieve out safe prime candidates
+SAFE_PRIME_SIEVE_PRIMES = rsa_key_gen.sievePrimes(1 << 16)[1:]
+
+def sieveSafePrimeWindow(start : int, length : int) -> bytearray:
+    """
+    Marks all q in start, ..., start + length - 1 for which q or 2q + 1 has a small prime factor.
+
+    2q + 1 is divisible by an odd prime p iff q = (p-1)/2 mod p, so both can be sieved with the same window.
+    Start should be bigger than the small primes.
+
+    Args:
+        start (int): First q of the window.
+        length (int): Length of the window.
+
+    Returns:
+        bytearray: 1 at index i if both start + i and 2 * (start + i) + 1 survived the sieve, 0 otherwise.
+    """
+    survivors = bytearray([1]) * length
+
+    # q has to be odd
+    survivors[start % 2::2] = bytes(len(range(start % 2, length, 2)))
+
+    for p in SAFE_PRIME_SIEVE_PRIMES:
+        for residue in (0, (p - 1) // 2):
+            first = (residue - start) % p
+            survivors[first::p] = bytes(len(range(first, length, p)))
+    return survivors
+
+def searchSafePrime(start : int, stopEvent : threading.Event | None = None) -> int | None:
+    """
+    Searches the first q >= start such that q and p = 2q + 1 are prime.
+
+    Only candidates surviving sieveSafePrimeWindow are tested. The cheap fermat test to base 2 on p comes first,
+    as it rules out most candidates. Only then q and p are checked with miller rabin.
+
+    Args:
+        start (int): Where the search starts. Should be bigger than the small primes.
+        stopEvent (threading.Event | None, optional): The search stops as soon as it is set. Defaults to None.
+
+    Returns:
+        int | None: q or None if the search was stopped.
+    """
+    windowLength = max(4096, 16 * start.bit_length())
+    while stopEvent is None or not stopEvent.is_set():
+        survivors = sieveSafePrimeWindow(start, windowLength)
+        i = survivors.find(1)
+        while i != -1:
+            q = start + i
+            p = 2 * q + 1
+            if rsa.powWithMod(2, p - 1, p) == 1 and rsa_key_gen.checkPrime(q) and rsa_key_gen.checkPrime(p):
+                return q
+            i = survivors.find(1, i + 1)
+        start += windowLength
+    return None
+
+# stop event of the safe prime worker processes. Set by initSafePrimeWorker
+safePrimeStopEvent = None
+
+def initSafePrimeWorker(stopEvent):
+    """
+    Sets up a worker process of genSafePrime.
+
+    Args:
+        stopEvent: Event shared by all workers that is set when a safe prime was found.
+    """
+    global safePrimeStopEvent
+    safePrimeStopEvent = stopEvent
+
+def safePrimeWorker(start : int) -> int | None:
+    """
+    Searches a safe prime in a worker process until one is found or the stop event is set.
+
+    Args:
+        start (int): Where the search starts.
+
+    Returns:
+        int | None: q or None if it was stopped.
+    """
+    q = searchSafePrime(start, safePrimeStopEvent)
+    if q is not None:
+        safePrimeStopEvent.set()
+    return q
+
+def genSafePrime(range : tuple[int] = (10**10, 10**20), numProcesses : int = 1) -> tuple[int]:
+    """
+    Generates a safe prime p = 2q + 1 where q is prime as well.
+
+    Args:
+        range (tuple[int], optional): The range of the start value of the search. It will be mutiplied by 30. Defaults to (10**10, 10**20).
+        numProcesses (int, optional): Number of processes that search from different random start values. Defaults to 1.
+
+    Returns:
+        tuple[int]: p, q
+    """
+    if numProcesses == 1:
+        q = searchSafePrime(30 * random.randrange(range[0], range[1]))
+        return 2 * q + 1, q
+
+    stopEvent = multiprocessing.Event()
+    with ProcessPoolExecutor(numProcesses, initializer=initSafePrimeWorker, initargs=(stopEvent, )) as executor:
+        futures = []
+        while len(futures) < numProcesses:
+            futures.append(executor.submit(safePrimeWorker, 30 * random.randrange(range[0], range[1])))
+        for future in as_completed(futures):
+            if future.result() is not None:
+                q = future.result()
+                return 2 * q + 1, q
+
+def subgroupGenerator(p : int) -> int:
+    """
+    Chooses a generator of the subgroup of prime order q for a safe prime p = 2q + 1.
+
+    Every square h^2 != 1 mod p lies in the subgroup of order q. As q is prime, it generates the whole subgroup.
+
+    Args:
+        p (int): Safe prime modulus
+
+    Returns:
+        int: Generator of order (p-1) / 2
+    """
+    while True:
+        g = pow(random.randrange(2, p-1), 2, p)
+        if g != 1:
+            return g
+
+def genPublicValues(range : tuple[int] = (10**10, 10**20), numProcesses : int = 1, primeOrder : bool = True) -> tuple[int]:
     """
     Generates a modulus and a generator for a diffie hellman exchange.
 
@@ -39,22 +198,199 @@ def genPublicValues(range : tuple[int] = (10**10, 10**20)) -> tuple[int]:
 
     Args:
         range (tuple[int], optional): The range of the prime search. While searching the value will be mutiplied by 30. Defaults to (10**10, 10**20).
+        numProcesses (int, optional): Number of processes searching for the safe prime. Defaults to 1.
+        primeOrder (bool, optional): Whether g should generate the subgroup of prime order q, which is needed for short exponents. Defaults to True.
 
     Returns:
         tuple[int]: Modulus p, Generator g
     """
-    while True:
-        # get a prime q
-        z = random.randrange(range[0], range[1])
-        q = rsa_key_gen.getNextPrime(30 * z)
+    p, _ = genSafePrime(range, numProcesses)
+    g = subgroupGenerator(p) if primeOrder else random.randrange(2, p-2)
+    return p, g
+
+def validatePublicValues(p : int, g : int, bits : int, numTries : int | None = None) -> bool:
+    """
+    Checks that p is a safe prime of the given size and g generates the subgroup of prime order q = (p-1) / 2. (See subgroupGenerator)
+
+    Otherwise short exponents (see shortExponentBits) would leak a mod 2.
+
+    Args:
+        p (int): Modulus
+        g (int): Generator
+        bits (int): Bit length of p.
+        numTries (int | None, optional): Miller rabin rounds per prime. (See rsa_key_gen.checkPrime) Defaults to None.
+
+    Returns:
+        bool: Whether the values are valid.
+    """
+    return (p.bit_length() == bits and 1 < g < p-1 and rsa.powWithMod(g, (p - 1) // 2, p) == 1
+            and rsa_key_gen.checkPrime(p, numTries) and rsa_key_gen.checkPrime((p - 1) // 2, numTries))
+
+def getPublicValues(bits : int = 2048, generate : bool = True, cache : parameters.ParameterCache = parameters.DEFAULT_CACHE) -> tuple[int] | None:
+    """
+    Returns a modulus of the given size and a generator for a diffie hellman exchange without generating them if possible.
+
+    The RFC 3526 groups are used for their sizes. Other sizes come from the parameter cache. Only if there are no
+    cached values, new ones are generated, validated and added to the cache.
+
+    Args:
+        bits (int, optional): Bit length of the modulus. Defaults to 2048.
+        generate (bool, optional): Whether missing values should be generated. Defaults to True.
+        cache (parameters.ParameterCache, optional): The cache to use. Defaults to parameters.DEFAULT_CACHE.
+
+    Returns:
+        tuple[int] | None: Modulus p, Generator g or None if there are none and generate is false.
+    """
+    group = parameters.modpGroup(bits)
+    if group is not None:
+        return group
+    
+    cached = cache.lookup("dh", str(bits), lambda values : len(values) == 2 and validatePublicValues(*values, bits, parameters.VALIDATION_TRIES))
+    if cached is not None:
+        return cached
+
+    if not generate:
+        return None
+
+    p, _ = genSafePrime((2**(bits-2) // 30, 2**(bits-1) // 30))
+    g = subgroupGenerator(p)
+    if validatePublicValues(p, g, bits):
+        cache.store("dh", str(bits), (p, g))
+    return p, g
+
+def benchmarkExponentSizes(sizes : list[int] = [1536, 2048, 3072, 4096], numExchanges : int = 20):
+    """
+    Compares the latency of one side of an exchange (transmit value and secret) with full and short exponents.
+
+    Args:
+        sizes (list[int], optional): Bit lengths of the RFC 3526 groups to use. Defaults to [1536, 2048, 3072, 4096].
+        numExchanges (int, optional): Number of exchanges per group and mode. Defaults to 20.
+    """
+    for bits in sizes:
+        p, g = parameters.modpGroup(bits)
+        other, _ = calcTransmitValue(p, g)
+
+        for name, exponentBits in [("full", None), ("short", shortExponentBits(p))]:
+            # builds the fixed base table
+            calcTransmitValue(p, g, exponentBits)
+
+            start = time.perf_counter()
+            for _ in range(numExchanges):
+                t, a = calcTransmitValue(p, g, exponentBits)
+                calcSecretFromTransmitValue(other, p, a)
+            latency = (time.perf_counter() - start) / numExchanges
+            print(f"{bits} bit group, {name} exponent ({exponentBits or bits} bits): {latency * 1000:.2f}ms")
+
+async def simulateExchange(p : int, g : int, executor : ProcessPoolExecutor, exponentBits : int | None = None) -> float:
+    """
+    Simulates one exchange between two peers that are connected by in-memory transports (queues).
+
+    Both exponentiations of each peer are offloaded to the executor, so the event loop only moves the messages.
+
+    Args:
+        p (int): Modolus
+        g (int): Generator
+        executor (ProcessPoolExecutor): Executor doing the exponentiations.
+        exponentBits (int | None, optional): Bit length of the private values. (See calcTransmitValue) Defaults to None.
+
+    Raises:
+        RuntimeError: If the peers calculated different secrets.
 
-        p = 2 * q + 1
+    Returns:
+        float: Latency of the exchange in seconds.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def peer(inbox : asyncio.Queue, outbox : asyncio.Queue) -> int:
+        transmitVal, a = await loop.run_in_executor(executor, calcTransmitValue, p, g, exponentBits)
+        await outbox.put(transmitVal)
+        otherVal = await inbox.get()
+        return await loop.run_in_executor(executor, calcSecretFromTransmitValue, otherVal, p, a)
+
+    start = time.perf_counter()
+    inbox1, inbox2 = asyncio.Queue(1), asyncio.Queue(1)
+    secret1, secret2 = await asyncio.gather(peer(inbox1, inbox2), peer(inbox2, inbox1))
+    if secret1 != secret2:
+        raise RuntimeError("peers calculated different secrets")
+    return time.perf_counter() - start
+
+def percentile(sortedValues : list[float], q : float) -> float:
+    """
+    Returns the q-th percentile (nearest rank) of sorted values.
+
+    Args:
+        sortedValues (list[float]): Values in ascending order.
+        q (float): Percentile between 0 and 100.
 
-        if rsa_key_gen.checkPrime(p):
-            # found a prime. whohoo
-            g = random.randrange(2, p-2)
-            return p, g
+    Returns:
+        float: The percentile.
+    """
+    index = min(len(sortedValues) - 1, max(0, round(q / 100 * len(sortedValues)) - 1))
+    return sortedValues[index]
+
+async def simulatePeers(p : int, g : int, numPeers : int = 1000, exponentBits : int | None = None, numProcesses : int | None = None, maxConcurrent : int | None = None) -> dict:
+    """
+    Simulates many peers doing diffie hellman exchanges concurrently. Every two peers exchange one key.
 
+    Args:
+        p (int): Modolus
+        g (int): Generator
+        numPeers (int, optional): Number of peers. Defaults to 1000.
+        exponentBits (int | None, optional): Bit length of the private values. (See calcTransmitValue) Defaults to None.
+        numProcesses (int | None, optional): Number of processes doing the exponentiations. Defaults to None (cpu count).
+        maxConcurrent (int | None, optional): Maximal number of exchanges in flight. Defaults to None (all at once).
+
+    Raises:
+        ValueError: If there are less than two peers.
+
+    Returns:
+        dict: exchanges, seconds, exchangesPerSecond and the latency percentiles p50, p90, p99 in seconds
+    """
+    if numPeers < 2:
+        raise ValueError("At least two peers are needed for an exchange")
+
+    numExchanges = numPeers // 2
+    numProcesses = numProcesses or multiprocessing.cpu_count()
+    semaphore = asyncio.Semaphore(maxConcurrent or numExchanges)
+
+    with ProcessPoolExecutor(numProcesses) as executor:
+        # builds the fixed base tables in the workers
+        await asyncio.gather(*[ asyncio.get_running_loop().run_in_executor(executor, calcTransmitValue, p, g, exponentBits) for _ in range(numProcesses) ])
+
+        async def limitedExchange() -> float:
+            async with semaphore:
+                return await simulateExchange(p, g, executor, exponentBits)
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*[ limitedExchange() for _ in range(numExchanges) ])
+        seconds = time.perf_counter() - start
+
+    latencies = sorted(latencies)
+    return {
+        "exchanges" : numExchanges,
+        "seconds" : seconds,
+        "exchangesPerSecond" : numExchanges / seconds,
+        "p50" : percentile(latencies, 50),
+        "p90" : percentile(latencies, 90),
+        "p99" : percentile(latencies, 99),
+    }
+
+def benchmarkPeers(sizes : list[int] = [2048, 3072], numPeers : int = 1000, numProcesses : int | None = None, maxConcurrent : int | None = 64):
+    """
+    Prints throughput and latency percentiles of simulated exchanges for RFC 3526 groups with full and short exponents.
+
+    Args:
+        sizes (list[int], optional): Bit lengths of the groups. Defaults to [2048, 3072].
+        numPeers (int, optional): Number of peers per run. Defaults to 1000.
+        numProcesses (int | None, optional): Number of processes doing the exponentiations. Defaults to None (cpu count).
+        maxConcurrent (int | None, optional): Maximal number of exchanges in flight. Defaults to 64.
+    """
+    for bits in sizes:
+        p, g = parameters.modpGroup(bits)
+        for name, exponentBits in [("full", None), ("short", shortExponentBits(p))]:
+            stats = asyncio.run(simulatePeers(p, g, numPeers, exponentBits, numProcesses, maxConcurrent))
+            print(f"{bits} bit group, {name} exponent: {stats['exchangesPerSecond']:.1f} exchanges/s, " +
+                  f"latency p50 {stats['p50'] * 1000:.1f}ms, p90 {stats['p90'] * 1000:.1f}ms, p99 {stats['p99'] * 1000:.1f}ms")
 
 if __name__ == "__main__":
     p, g = genPublicValues()
@@ -63,4 +399,19 @@ if __name__ == "__main__":
     t2, a2 = calcTransmitValue(p, g)
 
     print(calcSecretFromTransmitValue(t2, p, a1))
-    print(calcSecretFromTransmitValue(t1, p, a2))
\ No newline at end of file
+    print(calcSecretFromTransmitValue(t1, p, a2))
+
+    # well known and cached groups
+    for bits in [2048, 768]:
+        start = time.perf_counter()
+        p, g = getPublicValues(bits)
+        print(f"{bits} bit group: {time.perf_counter() - start:.3f}s")
+
+    # realistic sizes
+    for bits in [512, 1024]:
+        start = time.perf_counter()
+        p, q = genSafePrime((2**(bits-2) // 30, 2**(bits-1) // 30))
+        print(f"{bits} bit safe prime: {time.perf_counter() - start:.1f}s")
+
+    benchmarkExponentSizes()
+    benchmarkPeers()
@@ -1,6 +1,13 @@
 from pickle import FALSE
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 import random
+import threading
 import hashlib
+import time
+
+import include.parameters as parameters
 
 rsa = __import__("06_rsa")
 rsa_key_gen = __import__("07_rsa_key_gen")
@@ -8,6 +15,9 @@ sha1 = __import__("11_sha1")
 
 hash = lambda m : sha1.sha1(m)
 
+# hashes many messages at once (See sha1.sha1Batch)
+hashBatch = lambda ms : [ int.from_bytes(digest.tobytes(), 'big') for digest in sha1.sha1Batch(ms) ]
+
 def bitLength(n : int) -> int:
     """
     Calculates the number of bits of a number.
@@ -24,43 +34,197 @@ def bitLength(n : int) -> int:
         length += 1
     return length
 
-def genParameters(L : int = 1024, N : int = 160) -> tuple[int]:
+# odd primes used to sieve the candidates for p
+DSA_SIEVE_PRIMES = rsa_key_gen.SMALL_PRIMES[1:]
+
+def genQ(N : int) -> int:
+    """
+    Generates a random prime of bit length N.
+
+    Args:
+        N (int): Length of the prime.
+
+    Returns:
+        int: The prime q.
+    """
+    while True:
+        q = rsa_key_gen.getNextPrime(30 * random.randrange(2**(N-1) // 30, (2**N - 1) // 30))
+        if bitLength(q) == N:
+            return q
+
+def sieveProgressionWindow(q : int, kStart : int, length : int) -> bytearray:
+    """
+    Marks all even k in kStart, kStart + 2, ..., kStart + 2 * (length - 1) for which p = k*q + 1 has a small prime factor.
+
+    For an odd prime r, (kStart + 2i) * q + 1 is divisible by r iff i = -(kStart * q + 1) * (2q)^-1 mod r.
+
+    Args:
+        q (int): Prime q. It has to be bigger than the small primes.
+        kStart (int): First k of the window. It has to be even.
+        length (int): Number of k in the window.
+
+    Returns:
+        bytearray: 1 at index i if (kStart + 2i) * q + 1 survived the sieve, 0 otherwise.
+    """
+    survivors = bytearray([1]) * length
+    pStart = kStart * q + 1
+    for r in DSA_SIEVE_PRIMES:
+        first = (-pStart * pow(2 * q, -1, r)) % r
+        survivors[first::r] = bytes(len(range(first, length, r)))
+    return survivors
+
+def searchP(q : int, kStart : int, kEnd : int, stopEvent : threading.Event | None = None) -> int | None:
+    """
+    Searches the first prime p = k*q + 1 with kStart <= k < kEnd.
+
+    The progression is sieved in windows with small primes. Only the survivors are tested with checkPrime.
+
+    Args:
+        q (int): Prime q.
+        kStart (int): First k. It will be rounded up to an even number, as p has to be odd.
+        kEnd (int): Upper bound of k (exclusive).
+        stopEvent (threading.Event | None, optional): The search stops as soon as it is set. Defaults to None.
+
+    Returns:
+        int | None: p or None if there is no prime in the range or the search was stopped.
+    """
+    kStart += kStart % 2
+    windowLength = max(1024, 4 * bitLength(kStart * q))
+    while kStart < kEnd and (stopEvent is None or not stopEvent.is_set()):
+        survivors = sieveProgressionWindow(q, kStart, windowLength)
+        i = survivors.find(1)
+        while i != -1 and kStart + 2 * i < kEnd:
+            if rsa_key_gen.checkPrime(p := (kStart + 2 * i) * q + 1):
+                return p
+            i = survivors.find(1, i + 1)
+        kStart += 2 * windowLength
+    return None
+
+# stop event of the worker processes of genParameters. Set by initParameterWorker
+parameterStopEvent = None
+
+def initParameterWorker(stopEvent):
+    """
+    Sets up a worker process of genParameters.
+
+    Args:
+        stopEvent: Event shared by all workers that is set when p was found.
+    """
+    global parameterStopEvent
+    parameterStopEvent = stopEvent
+
+def parameterWorker(q : int, kStart : int, kEnd : int) -> int | None:
+    """
+    Searches p in a worker process until one is found, the range is exhausted or the stop event is set.
+
+    Args:
+        q (int): Prime q.
+        kStart (int): First k.
+        kEnd (int): Upper bound of k (exclusive).
+
+    Returns:
+        int | None: p or None.
+    """
+    p = searchP(q, kStart, kEnd, parameterStopEvent)
+    if p is not None:
+        parameterStopEvent.set()
+    return p
+
+def genParameters(L : int = 1024, N : int = 160, numProcesses : int = 1) -> tuple[int]:
     """
     Generates all global parameters used in the DSA
-    - q is prime of bit length L
-    - p is prime of bit length N and p = k*q+1 for some natural k
+    - q is prime of bit length N
+    - p is prime of bit length L and p = k*q+1 for some natural k
     - g is element in Z*_p with order q
 
+    All k, for which p has bit length L, are split into disjoint ranges, one per process. Every process scans its
+    range from a random start (see searchP) and the first p found is used. If no p is found, a new q is chosen.
+
     Args:
-        L (int, optional): Length of q. Defaults to 1024.
-        N (int, optional): Length of p. Defaults to 160.
+        L (int, optional): Length of p. Defaults to 1024.
+        N (int, optional): Length of q. Defaults to 160.
+        numProcesses (int, optional): Number of processes searching for p. Defaults to 1.
 
     Returns:
-        tuple[int]: q, p, g
+        tuple[int]: p, q, g
     """
-    s = random.randrange(2**(N-1) // 30, (2**N - 1) // 30)
-    q = rsa_key_gen.getNextPrime(s * 30)
+    p = None
+    while p is None:
+        q = genQ(N)
+
+        # 2^(L-1) < k*q + 1 < 2^L
+        kMin = 2**(L-1) // q + 1
+        kMax = (2**L - 1) // q
+        bounds = [ kMin + (kMax - kMin) * i // numProcesses for i in range(numProcesses + 1) ]
+        ranges = [ (random.randrange(bounds[i], bounds[i+1]), bounds[i+1]) for i in range(numProcesses) ]
 
-    # find p, q. If it fails, recursively recall this method
-    if bitLength(q) != N:
-        return genParameters(L, N)
+        if numProcesses == 1:
+            p = searchP(q, *ranges[0])
+            continue
 
-    # start value for k
-    k = (2**(L-1)) // q
-    while not rsa_key_gen.checkPrime(p := k*q+1):
-        if bitLength(p) > L:
-            return genParameters(L, N)
-        k += 1
+        stopEvent = multiprocessing.Event()
+        with ProcessPoolExecutor(numProcesses, initializer=initParameterWorker, initargs=(stopEvent, )) as executor:
+            futures = [ executor.submit(parameterWorker, q, kStart, kEnd) for kStart, kEnd in ranges ]
+            for future in as_completed(futures):
+                if future.result() is not None:
+                    p = future.result()
+                    break
     
     # find g.
     # g = h^((p-1)/q) mod p for a random 1 < h < p-1.
     # g shouldn't be 1
+    k = (p - 1) // q
     while True:
         h = random.randrange(2, p-2)
         g = rsa.powWithMod(h, k, p)
         if g != 1:
             return p, q, g
 
+def validateParameters(p : int, q : int, g : int, L : int, N : int, numTries : int | None = None) -> bool:
+    """
+    Checks the global parameters of the DSA. (See genParameters)
+
+    Args:
+        p (int): Prime p
+        q (int): Prime q
+        g (int): Generator g
+        L (int): Length of p.
+        N (int): Length of q.
+        numTries (int | None, optional): Miller rabin rounds per prime. (See rsa_key_gen.checkPrime) Defaults to None.
+
+    Returns:
+        bool: Whether the parameters are valid.
+    """
+    return (bitLength(p) == L and bitLength(q) == N and (p - 1) % q == 0 and 1 < g < p and rsa.powWithMod(g, q, p) == 1
+            and rsa_key_gen.checkPrime(q, numTries) and rsa_key_gen.checkPrime(p, numTries))
+
+def getParameters(L : int = 1024, N : int = 160, generate : bool = True, cache : parameters.ParameterCache = parameters.DEFAULT_CACHE) -> tuple[int] | None:
+    """
+    Returns global parameters for the DSA of the given sizes from the parameter cache.
+
+    Only if there are no cached parameters, new ones are generated, validated and added to the cache.
+
+    Args:
+        L (int, optional): Length of p. Defaults to 1024.
+        N (int, optional): Length of q. Defaults to 160.
+        generate (bool, optional): Whether missing parameters should be generated. Defaults to True.
+        cache (parameters.ParameterCache, optional): The cache to use. Defaults to parameters.DEFAULT_CACHE.
+
+    Returns:
+        tuple[int] | None: p, q, g or None if there are none and generate is false.
+    """
+    cached = cache.lookup("dsa", f"{L}/{N}", lambda values : len(values) == 3 and validateParameters(*values, L, N, parameters.VALIDATION_TRIES))
+    if cached is not None:
+        return cached
+
+    if not generate:
+        return None
+
+    p, q, g = genParameters(L, N)
+    if validateParameters(p, q, g, L, N):
+        cache.store("dsa", f"{L}/{N}", (p, q, g))
+    return p, q, g
+
 def genKey(p : int, q : int, g : int) -> tuple[int]:
     """
     Generate public and private key given public parameters.
@@ -74,11 +238,13 @@ def genKey(p : int, q : int, g : int) -> tuple[int]:
         tuple[int]: secret key, public key
     """
     x = random.randrange(2, q-2)
-    return x, rsa.powWithMod(g, x, p)
+    return x, rsa.getFixedBase(g, p).pow(x)
 
-def sign(hashedM : int, p : int, q : int, g : int, x : int) -> tuple[int]:
+def signWithR(hashedM : int, p : int, q : int, g : int, x : int) -> tuple[int]:
     """
-    Signes a method using the hashed message, private key and public parameters.
+    Signes a method like sign but additionally returns R = g^j mod p. (r = R mod q)
+
+    The standard signature (r, s) is contained. R is only needed for the batch verification (see batchVerify).
 
     Args:
         hashedM (int): Hashed message.
@@ -88,20 +254,158 @@ def sign(hashedM : int, p : int, q : int, g : int, x : int) -> tuple[int]:
         x (int): Secret key.
 
     Returns:
-        tuple[int]: signiture
+        tuple[int]: r, s, R
     """
     j = random.randrange(2, q-1)
-    r = rsa.powWithMod(g, j, p) % q
+    R = rsa.getFixedBase(g, p).pow(j)
+    r = R % q
 
     if r == 0:
-        return sign(hashedM, p, q, g, x)
+        return signWithR(hashedM, p, q, g, x)
     
     s = (rsa.mudularInverse(j, q) * (hashedM + r * x)) % q
 
     if s == 0:
-        return sign(hashedM, p, q, g, x)
+        return signWithR(hashedM, p, q, g, x)
     
-    return r, s
+    return r, s, R
+
+def sign(hashedM : int, p : int, q : int, g : int, x : int) -> tuple[int]:
+    """
+    Signes a method using the hashed message, private key and public parameters.
+
+    Args:
+        hashedM (int): Hashed message.
+        p (int): Public parameter prime p
+        q (int): Public parameter prime q
+        g (int): Public parameter generator g
+        x (int): Secret key.
+
+    Returns:
+        tuple[int]: signiture
+    """
+    return signWithR(hashedM, p, q, g, x)[:2]
+
+class NoncePool:
+    """
+    Pool of precomputed signing nonces (r, j^-1 mod q) for fast online signing.
+
+    Everything in a DSA signature that doesn't depend on the message is done in advance, so signing itself is
+    only two modular multiplications. A background thread refills the pool up to size whenever fewer than
+    watermark nonces are left. Every nonce is removed from the pool when it is taken, so it is never used twice.
+    """
+
+    def __init__(self, p : int, q : int, g : int, size : int = 100, watermark : int | None = None, background : bool = True):
+        """
+        Creates the pool and fills it.
+
+        Args:
+            p (int): Public parameter prime p
+            q (int): Public parameter prime q
+            g (int): Public parameter generator g
+            size (int, optional): Number of nonces the pool is refilled to. Defaults to 100.
+            watermark (int | None, optional): Refill as soon as fewer nonces are left. Has to be between 1 and size. Defaults to max(1, size // 2).
+            background (bool, optional): Whether a background thread refills the pool. Otherwise call fill. Defaults to True.
+
+        Raises:
+            ValueError: If the watermark is not between 1 and size.
+        """
+        self.p, self.q, self.g = p, q, g
+        self.size = size
+        self.watermark = max(1, size // 2) if watermark is None else watermark
+        if not 1 <= self.watermark <= size:
+            raise ValueError("Watermark has to be between 1 and size")
+        self.nonces = deque()
+        self.condition = threading.Condition()
+        self.stopped = False
+
+        self.fill()
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self.refillLoop, daemon=True)
+            self.thread.start()
+
+    def generate(self, count : int) -> list[tuple[int]]:
+        """
+        Generates new nonces.
+
+        Args:
+            count (int): How many nonces should be generated.
+
+        Returns:
+            list[tuple[int]]: Nonces (r, j^-1 mod q)
+        """
+        js = []
+        rs = []
+        while len(js) < count:
+            j = random.randrange(2, self.q-1)
+            r = rsa.getFixedBase(self.g, self.p).pow(j) % self.q
+            if r != 0:
+                js.append(j)
+                rs.append(r)
+        return list(zip(rs, rsa.batchModularInverse(js, self.q)))
+
+    def fill(self):
+        """
+        Fills the pool up to its size.
+        """
+        with self.condition:
+            missing = self.size - len(self.nonces)
+        if missing > 0:
+            nonces = self.generate(missing)
+            with self.condition:
+                self.nonces.extend(nonces)
+
+    def refillLoop(self):
+        """
+        Body of the background thread. Waits until the pool drops below the watermark and fills it again.
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda : self.stopped or len(self.nonces) < self.watermark)
+                if self.stopped:
+                    return
+            self.fill()
+
+    def take(self) -> tuple[int]:
+        """
+        Removes a nonce from the pool. If the pool is empty, a new one is generated right away.
+
+        Returns:
+            tuple[int]: Nonce (r, j^-1 mod q)
+        """
+        with self.condition:
+            nonce = self.nonces.popleft() if len(self.nonces) > 0 else None
+            if len(self.nonces) < self.watermark:
+                self.condition.notify()
+        return nonce if nonce is not None else self.generate(1)[0]
+
+    def sign(self, hashedM : int, x : int) -> tuple[int]:
+        """
+        Signes a method using the hashed message and private key with a nonce from the pool.
+
+        Args:
+            hashedM (int): Hashed message.
+            x (int): Secret key.
+
+        Returns:
+            tuple[int]: signiture
+        """
+        while True:
+            r, jInv = self.take()
+            s = (jInv * (hashedM + r * x)) % self.q
+            if s != 0:
+                return r, s
+
+    def close(self):
+        """
+        Stops the background thread.
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
 
 def verify(signatur : tuple[int], hashedM : int, p : int, q : int, g : int, y : int) -> bool:
     """
@@ -126,12 +430,116 @@ def verify(signatur : tuple[int], hashedM : int, p : int, q : int, g : int, y :
     w = rsa.mudularInverse(s, q)
     u1 = (hashedM * w) % q
     u2 = (r * w) % q
-    v = ((rsa.powWithMod(g, u1, p) * rsa.powWithMod(y, u2, p)) % p) % q
+    v = rsa.multiPowWithMod([g, y], [u1, u2], p) % q
 
     return v == r
 
+def batchVerify(signaturs : list[tuple[int]], hashedMs : list[int], p : int, q : int, g : int, y : int | list[int], securityBits : int = 64) -> list[bool]:
+    """
+    Verifies many signatures at once with the small exponents test.
+
+    A signature (r, s) is valid iff R = g^u1 * y^u2 mod p for its R = g^j mod p. Instead of checking every signature,
+    random small exponents d_i are drawn and only
+
+        g^(sum d_i * u1_i) * prod over signers y^(sum d_i * u2_i) = prod R_i^d_i
+
+    is checked, which costs two multi-exponentiations for the whole batch. A batch containing an invalid signature
+    passes with a probability of about 2^-securityBits. If the check fails, the batch is split in halves until the bad
+    signatures are found. Single signatures get checked with verify.
+
+    The standard signature only contains r = R mod q, so the signatures have to be created by signWithR.
+    Signatures with R mod q != r are rejected. So are signatures whose R is not in the subgroup of order q (R^q != 1 mod p),
+    otherwise eg. R = -g^u1 * y^u2 would pass every test with even d_i.
+
+    Args:
+        signaturs (list[tuple[int]]): Signatures (r, s, R) as returned by signWithR.
+        hashedMs (list[int]): Hashed messages.
+        p (int): Public parameter prime p
+        q (int): Public parameter prime q
+        g (int): Public parameter generator g
+        y (int | list[int]): Public key of the person who signed. Or a list with the public key for every signature.
+        securityBits (int, optional): Bit length of the random exponents. Defaults to 64.
+
+    Returns:
+        list[bool]: Whether the verification of each signature succeeded.
+    """
+    ys = y if isinstance(y, list) else [ y ] * len(signaturs)
+    valid = [ False ] * len(signaturs)
+
+    # signatures that can be discarded right away
+    candidates = [ i for i, (r, s, R) in enumerate(signaturs) if 0 < r < q and 0 < s < q and 1 < R < p and R % q == r and rsa.powWithMod(R, q, p) == 1 ]
+
+    ws = rsa.batchModularInverse([ signaturs[i][1] for i in candidates ], q)
+    u1s = { i : (hashedMs[i] * w) % q for i, w in zip(candidates, ws) }
+    u2s = { i : (signaturs[i][0] * w) % q for i, w in zip(candidates, ws) }
+
+    def check(indices : list[int]):
+        if len(indices) == 1:
+            i = indices[0]
+            valid[i] = verify(signaturs[i][:2], hashedMs[i], p, q, g, ys[i])
+            return
+
+        deltas = [ random.randrange(1, 1 << securityBits) for _ in indices ]
+
+        exponentOfG = 0
+        exponentsOfY = {}
+        for i, delta in zip(indices, deltas):
+            exponentOfG += delta * u1s[i]
+            exponentsOfY[ys[i]] = exponentsOfY.get(ys[i], 0) + delta * u2s[i]
+
+        left = rsa.multiPowWithMod([ g ] + list(exponentsOfY.keys()), [ exponentOfG % q ] + [ e % q for e in exponentsOfY.values() ], p)
+        right = rsa.multiPowWithMod([ signaturs[i][2] for i in indices ], deltas, p)
+
+        if left == right:
+            for i in indices:
+                valid[i] = True
+        else:
+            check(indices[:len(indices) // 2])
+            check(indices[len(indices) // 2:])
+
+    if len(candidates) > 0:
+        check(candidates)
+    return valid
+
+def benchmarkBatchVerify(p : int, q : int, g : int, batchSizes : list[int] = [1, 4, 16, 64, 256]):
+    """
+    Prints the time per signature of batchVerify for growing batch sizes next to the one of verify.
+
+    Args:
+        p (int): Public parameter prime p
+        q (int): Public parameter prime q
+        g (int): Public parameter generator g
+        batchSizes (list[int], optional): The batch sizes. Defaults to [1, 4, 16, 64, 256].
+    """
+    x, y = genKey(p, q, g)
+    hashedMs = hashBatch([ random.randbytes(16) for _ in range(max(batchSizes)) ])
+    signaturs = [ signWithR(hashedM, p, q, g, x) for hashedM in hashedMs ]
+
+    start = time.perf_counter()
+    for signatur, hashedM in zip(signaturs, hashedMs):
+        verify(signatur[:2], hashedM, p, q, g, y)
+    print(f"verify: {1000 * (time.perf_counter() - start) / len(signaturs):.3f}ms per signature")
+
+    for batchSize in batchSizes:
+        start = time.perf_counter()
+        batchVerify(signaturs[:batchSize], hashedMs[:batchSize], p, q, g, y)
+        print(f"batchVerify ({batchSize}): {1000 * (time.perf_counter() - start) / batchSize:.3f}ms per signature")
+
+def benchmarkGenParameters(sizes : list[tuple[int]] = [(1024, 160), (2048, 224), (2048, 256)], numProcesses : int = 1):
+    """
+    Prints how long genParameters takes for different sizes.
+
+    Args:
+        sizes (list[tuple[int]], optional): Pairs (L, N). Defaults to [(1024, 160), (2048, 224), (2048, 256)].
+        numProcesses (int, optional): Number of processes searching for p. Defaults to 1.
+    """
+    for L, N in sizes:
+        start = time.perf_counter()
+        p, q, g = genParameters(L, N, numProcesses)
+        print(f"genParameters({L}, {N}): {time.perf_counter() - start:.2f}s")
+
 if __name__ == "__main__":
-    p, q, g = genParameters()
+    p, q, g = getParameters()
     x, y    = genKey(p, q, g)
     m = bytearray([2, 3, 4])
     hashedM = hash(m)
@@ -145,3 +553,21 @@ if __name__ == "__main__":
 
     print(verify((signatur[0]-1, signatur[1]+1), hashedM+1, p, q, g, y))
 
+    # online signing with precomputed nonces
+    pool = NoncePool(p, q, g, 200, 50)
+    start = time.perf_counter()
+    signaturs = [ pool.sign(hashedM, x) for _ in range(100) ]
+    print(f"NoncePool.sign: {1000 * (time.perf_counter() - start) / 100:.3f}ms per signature")
+    print(all(verify(signatur, hashedM, p, q, g, y) for signatur in signaturs))
+    pool.close()
+
+    # forged signature with R = -g^a * y^b mod p. It would pass the small exponents test for every even d
+    a, b = random.randrange(1, q), random.randrange(1, q)
+    R = p - rsa.multiPowWithMod([g, y], [a, b], p)
+    s = (R % q * rsa.mudularInverse(b, q)) % q
+    forgedHashedM = (a * s) % q
+    signaturs = [ signWithR(hashedM, p, q, g, x) for _ in range(3) ]
+    print(batchVerify(signaturs[:2] + [ (R % q, s, R) ] + signaturs[2:], [ hashedM ] * 2 + [ forgedHashedM, hashedM ], p, q, g, y))
+
+    benchmarkBatchVerify(p, q, g)
+    benchmarkGenParameters()
@@ -1,61 +1,162 @@
-class int32:
+import struct
+
+import numpy as np
+
+def padding(length : int) -> bytes:
     """
-    Represents an 32 bit Integer that automatically overflows without grumble.
+    Returns the sha1 padding for a message of the given length, so that the padded byte length is a multiple of 64 and the last 8 bytes are the message length in bits.
 
-    I implemented that mainly because of __add__, __invert__ und __lshift__.
+    Args:
+        length (int): Byte length of the message.
+
+    Returns:
+        bytes: The padding that has to be appended to the message.
     """
+    numPadding = (55 - length) % 64
+    return b"\x80" + bytes(numPadding) + (8 * length).to_bytes(8, byteorder='big')
 
-    MAX = 1 << 32
-
-    def __init__(self, val : int | bytearray | bytes = 0):
-        if isinstance(val, int):
-            self.val = val  % int32.MAX
-        elif isinstance(val, bytearray) or isinstance(val, bytes):
-            self.val = int.from_bytes(val, byteorder='big') % int32.MAX
-        else:
-            raise TypeError("Cration of int32 must happen with int or bytearray not " + str(type(val)))
-    
-
-    def __add__(self, o : 'int32') -> 'int32':
-        return int32(self.val + o.val)
-    
-    def __and__(self, o : 'int32') -> 'int32':
-        return int32(self.val & o.val)
-
-    def __or__(self, o : 'int32') -> 'int32':
-        return int32(self.val | o.val)
-
-    def __xor__(self, o : 'int32') -> 'int32':
-        return int32(self.val ^ o.val)
-
-    def __invert__(self) -> 'int32':
-        return int32(int32.MAX - self.val - 1)
-    
-    def __lshift__(self, amount : int) -> 'int32':
-        # cyclic left shift
-        leftMask = self.val >> (32 - amount)
-        return int32((self.val << amount) | leftMask)
-    
-    def __str__(self) -> str:
-        return "{:32b}".format(self.val)
-    
-
-
-def addPadding(message : bytearray) -> bytearray:
+MASK = 0xFFFFFFFF
+
+# initial hash values
+H = (0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0)
+
+def compressBlock(state : tuple[int], block : bytes | bytearray) -> tuple[int]:
     """
-    Does the sha1 preprocessing by adding a padding so that the byte length is congruent 56 mod 64 and the last 8 bytes are the text length in bytes.
+    Applies the sha1 compression function to one 64 byte block.
+
+    All words are plain ints that are masked with & MASK after every addition or rotation.
 
     Args:
-        message (bytearray): The message we want to preprocess.
+        state (tuple[int]): The five 32 bit hash values h0, ..., h4.
+        block (bytes | bytearray): The 64 byte block.
 
     Returns:
-        bytearray: The result of the preprocessing.
+        tuple[int]: The new hash values.
     """
-    mL = 8 * len(message)
+    # split the block into words and extend the word list
+    words = list(struct.unpack(">16I", block))
+    for i in range(16, 80):
+        x = words[i-3] ^ words[i-8] ^ words[i-14] ^ words[i-16]
+        words.append(((x << 1) | (x >> 31)) & MASK)
+
+    h0, h1, h2, h3, h4 = state
+    a, b, c, d, e = state
 
-    numPadding = (120 - ((len(message) + 1) % 64)) % 64
-    return message + bytearray([ 0x80 ] + [ 0 ] * numPadding) + mL.to_bytes(8, byteorder='big')
+    # the bits of (a << 5) above 32 bits vanish with the mask after the addition
+    for i in range(0, 20):
+        tmp = (((a << 5) | (a >> 27)) + (d ^ (b & (c ^ d))) + e + 0x5A827999 + words[i]) & MASK
+        a, b, c, d, e = tmp, a, ((b << 30) | (b >> 2)) & MASK, c, d
+
+    for i in range(20, 40):
+        tmp = (((a << 5) | (a >> 27)) + (b ^ c ^ d) + e + 0x6ED9EBA1 + words[i]) & MASK
+        a, b, c, d, e = tmp, a, ((b << 30) | (b >> 2)) & MASK, c, d
+
+    for i in range(40, 60):
+        tmp = (((a << 5) | (a >> 27)) + ((b & c) | (d & (b | c))) + e + 0x8F1BBCDC + words[i]) & MASK
+        a, b, c, d, e = tmp, a, ((b << 30) | (b >> 2)) & MASK, c, d
+
+    for i in range(60, 80):
+        tmp = (((a << 5) | (a >> 27)) + (b ^ c ^ d) + e + 0xCA62C1D6 + words[i]) & MASK
+        a, b, c, d, e = tmp, a, ((b << 30) | (b >> 2)) & MASK, c, d
+
+    return (h0 + a) & MASK, (h1 + b) & MASK, (h2 + c) & MASK, (h3 + d) & MASK, (h4 + e) & MASK
+
+class Sha1:
+    """
+    Incremental sha1 hasher with the interface of hashlib.
+
+    Complete 64 byte blocks are compressed as soon as they arrive, so only the remainder of less than 64 bytes is buffered.
+    The padding is only built by digest, which leaves the hasher unchanged, so more data can be added afterwards.
+    """
 
+    BLOCK_SIZE = 64
+    DIGEST_SIZE = 20
+
+    def __init__(self, message : str | bytes | bytearray = b""):
+        """
+        Creates the hasher.
+
+        Args:
+            message (str | bytes | bytearray, optional): First data to hash. Defaults to b"".
+        """
+        self.state = H
+        self.buffer = bytearray()
+        self.length = 0
+        self.update(message)
+
+    def update(self, data : str | bytes | bytearray):
+        """
+        Adds data to the hashed message.
+
+        Args:
+            data (str | bytes | bytearray): The data. Strings are encoded as UTF-8.
+        """
+        if isinstance(data, str):
+            data = data.encode('UTF-8')
+        data = memoryview(data).cast("B")
+        self.length += len(data)
+
+        # complete the buffered block first
+        if self.buffer:
+            missing = Sha1.BLOCK_SIZE - len(self.buffer)
+            self.buffer += data[:missing]
+            data = data[missing:]
+            if len(self.buffer) < Sha1.BLOCK_SIZE:
+                return
+            self.state = compressBlock(self.state, self.buffer)
+
+        state = self.state
+        end = len(data) - len(data) % Sha1.BLOCK_SIZE
+        for i in range(0, end, Sha1.BLOCK_SIZE):
+            state = compressBlock(state, data[i : i+Sha1.BLOCK_SIZE])
+        self.state = state
+        self.buffer = bytearray(data[end:])
+
+    def copy(self) -> 'Sha1':
+        """
+        Clones the hasher. Only the state, the buffer and the length are copied.
+
+        Returns:
+            Sha1: Hasher with the same midstate.
+        """
+        other = Sha1.__new__(Sha1)
+        other.state = self.state
+        other.buffer = bytearray(self.buffer)
+        other.length = self.length
+        return other
+
+    def intdigest(self) -> int:
+        """
+        Returns the digest of all data added so far as an int (like sha1).
+
+        Returns:
+            int: Hash digest.
+        """
+        tail = self.buffer + padding(self.length)
+        state = self.state
+        for i in range(0, len(tail), Sha1.BLOCK_SIZE):
+            state = compressBlock(state, tail[i : i+Sha1.BLOCK_SIZE])
+
+        h0, h1, h2, h3, h4 = state
+        return (h0 << (32*4)) + (h1 << (32*3)) + (h2 << (32*2)) + (h3 << (32*1)) + h4
+
+    def digest(self) -> bytes:
+        """
+        Returns the digest of all data added so far.
+
+        Returns:
+            bytes: The 20 byte digest.
+        """
+        return self.intdigest().to_bytes(Sha1.DIGEST_SIZE, byteorder='big')
+
+    def hexdigest(self) -> str:
+        """
+        Returns the digest of all data added so far as hex string.
+
+        Returns:
+            str: The 40 hex digits of the digest.
+        """
+        return self.digest().hex()
 
 def sha1(message : str | bytearray) -> int:
     """
@@ -67,57 +168,89 @@ def sha1(message : str | bytearray) -> int:
     Returns:
         int: Hash digest.
     """
-    if isinstance(message, str):
-        message = bytearray(message, 'UTF-8')
-    
-    message = addPadding(message)
-
-    h0 = int32(0x67452301)
-    h1 = int32(0xEFCDAB89)
-    h2 = int32(0x98BADCFE)
-    h3 = int32(0x10325476)
-    h4 = int32(0xC3D2E1F0)
-
-    # split the message into blocks
-    blocks = [ message[64*i : 64*(i+1)] for i in range(len(message) // 64)]
-
-    for block in blocks:
-        # split one block into words
-        words = [ int32(block[4*i : 4*(i+1)]) for i in range(16)]
-        
-        # extends the word list
-        for i in range(16, 80):
-            words.append((words[i-3] ^ words[i-8] ^ words[i-14] ^ words[i-16]) << 1)
-        
-        # initialize the variables
-        a, b, c, d, e = h0, h1, h2, h3, h4
-
-        # do the crazy sha-1 stuff
-        for i in range(80):
-            if i <= 19:
-                f = (b & c) | ((~b) & d)
-                k = int32(0x5A827999)
-            elif 20 <= i <= 39:
-                f = b ^ c ^ d
-                k = int32(0x6ED9EBA1)
-            elif 40 <= i <= 59:
-                f = (b & c) | (b & d) | (c & d)
-                k = int32(0x8F1BBCDC)
-            else:
-                f = b ^ c ^ d
-                k = int32(0xCA62C1D6)
-            
-            tmp = (a << 5) + f + e + k + words[i]
-            a, b, c, d, e = tmp, a, b << 30, c, d
-        
-        h0 += a
-        h1 += b
-        h2 += c
-        h3 += d
-        h4 += e
-    
-
-    return (h0.val << (32*4)) + (h1.val << (32*3)) + (h2.val << (32*2)) + (h3.val << (32*1)) + h4.val
-    
+    return Sha1(message).intdigest()
+
+def sha1File(path : str, chunkSize : int = 1 << 16) -> int:
+    """
+    Hashes a file chunk by chunk, so it never has to be in memory completely.
+
+    Args:
+        path (str): Path of the file.
+        chunkSize (int, optional): Number of bytes read at once. Defaults to 1 << 16.
+
+    Returns:
+        int: Hash digest.
+    """
+    hasher = Sha1()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunkSize):
+            hasher.update(chunk)
+    return hasher.intdigest()
+
+def compressBlocks(state : np.ndarray, words : np.ndarray) -> np.ndarray:
+    """
+    Applies the sha1 compression function to one block of every lane at once. (See compressBlock)
+
+    uint32 arithmetic of numpy overflows like the 32 bit words of sha1, so no masking is needed.
+
+    Args:
+        state (np.ndarray): uint32 array of shape (5, n) with the hash values of the n lanes.
+        words (np.ndarray): uint32 array of shape (16, n) with the words of the blocks.
+
+    Returns:
+        np.ndarray: The new hash values of shape (5, n).
+    """
+    rotate = lambda x, amount : (x << np.uint32(amount)) | (x >> np.uint32(32 - amount))
+
+    w = np.empty((80, words.shape[1]), dtype=np.uint32)
+    w[:16] = words
+    for i in range(16, 80):
+        w[i] = rotate(w[i-3] ^ w[i-8] ^ w[i-14] ^ w[i-16], 1)
+
+    a, b, c, d, e = state
+
+    for i in range(0, 20):
+        a, b, c, d, e = rotate(a, 5) + (d ^ (b & (c ^ d))) + e + np.uint32(0x5A827999) + w[i], a, rotate(b, 30), c, d
+    for i in range(20, 40):
+        a, b, c, d, e = rotate(a, 5) + (b ^ c ^ d) + e + np.uint32(0x6ED9EBA1) + w[i], a, rotate(b, 30), c, d
+    for i in range(40, 60):
+        a, b, c, d, e = rotate(a, 5) + ((b & c) | (d & (b | c))) + e + np.uint32(0x8F1BBCDC) + w[i], a, rotate(b, 30), c, d
+    for i in range(60, 80):
+        a, b, c, d, e = rotate(a, 5) + (b ^ c ^ d) + e + np.uint32(0xCA62C1D6) + w[i], a, rotate(b, 30), c, d
+
+    return state + np.stack([a, b, c, d, e])
+
+def sha1Batch(messages : list[bytes | bytearray]) -> np.ndarray:
+    """
+    Hashes many messages at once. Every lane of the numpy arrays hashes one message.
+
+    The messages are bucketed by length, so all messages of a bucket have the same padding and number of blocks.
+    Many short messages of few different lengths (eg the inputs of mgf1) are the best case.
+
+    Args:
+        messages (list[bytes | bytearray]): The messages.
+
+    Returns:
+        np.ndarray: uint8 array of shape (len(messages), 20). Row i is the digest of messages[i].
+    """
+    buckets = {}
+    for index, message in enumerate(messages):
+        buckets.setdefault(len(message), []).append(index)
+
+    digests = np.empty((len(messages), Sha1.DIGEST_SIZE), dtype=np.uint8)
+    for length, indices in buckets.items():
+        tail = padding(length)
+        padded = b"".join(bytes(messages[i]) + tail for i in indices)
+
+        # words[j] has shape (16, n) and contains the words of the j-th block of all lanes
+        words = np.frombuffer(padded, dtype=">u4").reshape(len(indices), -1, 16).astype(np.uint32).transpose(1, 2, 0)
+
+        state = np.repeat(np.array(H, dtype=np.uint32)[:, None], len(indices), axis=1)
+        for blockWords in words:
+            state = compressBlocks(state, blockWords)
+
+        digests[indices] = np.ascontiguousarray(state.T, dtype=">u4").view(np.uint8).reshape(len(indices), Sha1.DIGEST_SIZE)
+    return digests
+
 if __name__ == "__main__":
     print(hex(sha1("")))
\ No newline at end of file
@@ -0,0 +1,205 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+from numpy import uint8, uint16
+import numpy as np
+import random
+
+linear_analysis = __import__("05_linear_analysis")
+
+
+def differenceDistributionTable(sBox : list[uint8]) -> np.ndarray:
+    """
+    Computes the difference distribution table of a 4-bit sBox.
+
+    Args:
+        sBox (list[uint8]): The sBox. If sBox[a] = b a 4-bit chunk of value a will be replaced by b.
+
+    Returns:
+        np.ndarray: 16x16 table. table[dx, dy] is the number of inputs x such that sBox[x] ^ sBox[x ^ dx] = dy.
+    """
+    sBox = np.array(sBox, dtype=np.uint8)
+    inputs = np.arange(16, dtype=np.uint8)
+
+    table = np.zeros((16, 16), dtype=np.int64)
+    for dx in range(16):
+        outputDiffs = sBox[inputs] ^ sBox[inputs ^ dx]
+        table[dx] = np.bincount(outputDiffs, minlength=16)
+    return table
+
+def permute(diff : int, pBox : list[uint8]) -> int:
+    """
+    Sends a difference through a (bit) permutation.
+
+    Args:
+        diff (int): The 16-bit difference.
+        pBox (list[uint8]): The P-box of the round. The bit at position a will be moved to position pBox[a].
+
+    Returns:
+        int: The permuted difference.
+    """
+    permuted = 0
+    for bit in range(16):
+        permuted ^= ((diff >> bit) & 1) << pBox[bit]
+    return permuted
+
+def findCharacteristics(sBox : list[list[uint8]], pBox : list[list[uint8]], numRounds : int, beamWidth : int = 64, numCharacteristics : int = 10) -> list[tuple]:
+    """
+    Searches for high probability differential characteristics through all but the last round of a spn generated by generateSPN.
+
+    The search starts with every input difference that activates a single S-box. Round by round every difference is sent
+    through all possible S-box output differences (weighted by the difference distribution table) and through the P-box.
+    After every round only the beamWidth most probable characteristics are kept.
+
+    Args:
+        sBox (list[list[uint8]]): S-boxes per round. See generateSPN.
+        pBox (list[list[uint8]]): P-boxes per round. See generateSPN.
+        numRounds (int): Number of rounds of the spn. The characteristic covers the first numRounds-1 rounds.
+        beamWidth (int, optional): How many characteristics are kept after every round. Defaults to 64.
+        numCharacteristics (int, optional): How many characteristics should be returned. Defaults to 10.
+
+    Returns:
+        list[tuple]: (inputDiff, outputDiff, probability) sorted by probability, best first. outputDiff is the difference in front of the last substitution.
+    """
+    tables = [ differenceDistributionTable(sBox[round]) for round in range(numRounds - 1) ]
+
+    # (inputDiff, currentDiff) -> probability of the best path
+    characteristics = { (n << (chunk * 4), n << (chunk * 4)) : 1.0 for chunk in range(4) for n in range(1, 16) }
+
+    for round in range(numRounds - 1):
+        nextCharacteristics = {}
+
+        for (inputDiff, diff), probability in characteristics.items():
+            # all possible output differences of the substitution with their probability
+            outputs = [ (0, probability) ]
+            for chunk in range(4):
+                chunkDiff = (diff >> (chunk * 4)) & 0b1111
+                if chunkDiff == 0:
+                    continue
+                outputs = [ (out ^ (dy << (chunk * 4)), p * count / 16)
+                            for out, p in outputs
+                            for dy, count in enumerate(tables[round][chunkDiff]) if count > 0 ]
+
+            for out, p in outputs:
+                nextDiff = permute(out, pBox[round])
+                if p > nextCharacteristics.get((inputDiff, nextDiff), 0):
+                    nextCharacteristics[(inputDiff, nextDiff)] = p
+
+        best = sorted(nextCharacteristics.items(), key = lambda e : e[1], reverse = True)[:beamWidth]
+        characteristics = dict(best)
+
+    return [ (uint16(inputDiff), uint16(outputDiff), probability) for (inputDiff, outputDiff), probability in characteristics.items() ][:numCharacteristics]
+
+def generateChosenPairs(spn : Callable[[np.ndarray], np.ndarray], inputDiff : uint16, numPairs : int) -> tuple[np.ndarray]:
+    """
+    Generates ciphertext pairs for random plaintext pairs with a fixed difference.
+
+    Args:
+        spn (Callable[[np.ndarray], np.ndarray]): Vectorised enciphering method with bound keys. (See generateVectorizedSPN and bindKeysToSPN)
+        inputDiff (uint16): The difference of the plaintexts in every pair.
+        numPairs (int): How many pairs should be generated.
+
+    Returns:
+        tuple[np.ndarray]: Two uint16 arrays with the cryptotexts of the first and the second plaintext of each pair.
+    """
+    plaintexts = np.array([ random.getrandbits(16) for _ in range(numPairs) ], dtype=np.uint16)
+    return spn(plaintexts), spn(plaintexts ^ np.uint16(inputDiff))
+
+def countRightPairs(cryptotexts1 : np.ndarray, cryptotexts2 : np.ndarray, sBox : list[uint8], outputDiff : uint16, numProcesses : int = 1) -> np.ndarray:
+    """
+    Counts for every guess of the last round key chunks how many pairs follow the differential characteristic.
+
+    Pairs with a difference in a chunk that is inactive in outputDiff can not be right pairs and are filtered out first.
+    Every remaining pair suggests all subkeys for which the partially decrypted difference matches outputDiff. The counters
+    are a histogram of these suggestions.
+
+    Args:
+        cryptotexts1 (np.ndarray): Cryptotexts of the first plaintexts.
+        cryptotexts2 (np.ndarray): Cryptotexts of the second plaintexts.
+        sBox (list[uint8]): The sBox used in the spn at the last round.
+        outputDiff (uint16): The difference in front of the last substitution predicted by the characteristic.
+        numProcesses (int, optional): Number of processes the pairs are split over. Defaults to 1.
+
+    Returns:
+        np.ndarray: Counter for every smushed key (see doLinearAnalysis). The first active chunk is the most significant one.
+    """
+    includedChunks = [i for i in range(4) if ((outputDiff >> i*4) & 0b1111) != 0]
+
+    if numProcesses > 1:
+        with ProcessPoolExecutor(numProcesses) as executor:
+            parts = zip(np.array_split(cryptotexts1, numProcesses), np.array_split(cryptotexts2, numProcesses))
+            futures = [ executor.submit(countRightPairs, part1, part2, sBox, outputDiff) for part1, part2 in parts ]
+            return sum(future.result() for future in futures)
+
+    # calculate inverse sBox
+    sBoxInv = np.zeros(16, dtype=np.uint16)
+    for index, val in enumerate(sBox):
+        sBoxInv[val] = index
+
+    # filter out wrong pairs
+    inactiveMask = np.uint16(0xFFFF ^ sum(0b1111 << (chunk * 4) for chunk in includedChunks))
+    cryptotexts1 = np.asarray(cryptotexts1, dtype=np.uint16)
+    cryptotexts2 = np.asarray(cryptotexts2, dtype=np.uint16)
+    candidates = ((cryptotexts1 ^ cryptotexts2) & inactiveMask) == 0
+    cryptotexts1, cryptotexts2 = cryptotexts1[candidates], cryptotexts2[candidates]
+
+    # right[g, n] tells whether the n-th pair is a right pair for the smushed key guess g
+    right = np.ones((1, len(cryptotexts1)), dtype=bool)
+    guesses = np.arange(16, dtype=np.uint16)[:, None]
+    for chunk in includedChunks:
+        chunk1 = (cryptotexts1 >> (chunk * 4)) & 0b1111
+        chunk2 = (cryptotexts2 >> (chunk * 4)) & 0b1111
+        target = (outputDiff >> (chunk * 4)) & 0b1111
+        chunkRight = (sBoxInv[chunk1 ^ guesses] ^ sBoxInv[chunk2 ^ guesses]) == target
+        right = (right[:, None, :] & chunkRight[None, :, :]).reshape(-1, len(cryptotexts1))
+
+    suggestedKeys = np.nonzero(right)[0]
+    return np.bincount(suggestedKeys, minlength=1 << (len(includedChunks) * 4))
+
+def doDifferentialAnalysis(spn : Callable[[np.ndarray], np.ndarray], sBox : list[uint8], inputDiff : uint16, outputDiff : uint16, numPairs : int = 5000, numProcesses : int = 1) -> uint16:
+    """
+    Performs differential analysis on a spn with a chosen plaintext attack. It will return guessed parts of the last round key.
+
+    Args:
+        spn (Callable[[np.ndarray], np.ndarray]): Vectorised enciphering method with bound keys. (See generateVectorizedSPN and bindKeysToSPN)
+        sBox (list[uint8]): The sBox used in the spn at the last round.
+        inputDiff (uint16): Plaintext difference of the differential characteristic.
+        outputDiff (uint16): Difference in front of the last substitution of the differential characteristic.
+        numPairs (int, optional): How many chosen plaintext pairs should be used. Defaults to 5000.
+        numProcesses (int, optional): Number of processes the counting is split over. Defaults to 1.
+
+    Returns:
+        uint16: Guessed parts of the last round key.
+    """
+    includedChunks = [i for i in range(4) if ((outputDiff >> i*4) & 0b1111) != 0]
+
+    cryptotexts1, cryptotexts2 = generateChosenPairs(spn, inputDiff, numPairs)
+    counts = countRightPairs(cryptotexts1, cryptotexts2, sBox, outputDiff, numProcesses)
+    smushedKey = int(np.argmax(counts))
+
+    print(f"Best probability: {counts[smushedKey] / numPairs}")
+
+    # convert smushed key into the actual key
+    key = uint16(0)
+    for chunkIndex, chunk in enumerate(reversed(includedChunks)):
+        key ^= uint16(((smushedKey >> (chunkIndex * 4)) & 0b1111) << (chunk * 4))
+    return key
+
+if __name__ == "__main__":
+    SBOX = [ 0xE, 0x4, 0xD, 0x1, 0x2, 0xF, 0xB, 0x8, 0x3, 0xA, 0x6, 0xC, 0x5, 0x9, 0x0, 0x7 ]
+    PBOX = [ 0x0, 0x4, 0x8, 0xC, 0x1, 0x5, 0x9, 0xD, 0x2, 0x6, 0xA, 0xE, 0x3, 0x7, 0xB, 0xF ]
+    KEY  = 0x5F21
+
+    spn = linear_analysis.bindKeysToSPN(linear_analysis.generateVectorizedSPN([SBOX]*4, [PBOX]*4, 4), [KEY]*5)
+
+    print(differenceDistributionTable(SBOX))
+
+    # use the best characteristic that needs only 2 chunks of the last round key
+    characteristics = findCharacteristics([SBOX]*4, [PBOX]*4, 4)
+    inputDiff, outputDiff, probability = next(c for c in characteristics if len([i for i in range(4) if ((c[1] >> i*4) & 0b1111) != 0]) <= 2)
+    print("\nCharacteristic: {:016b} -> {:016b} with probability {}".format(inputDiff, outputDiff, probability))
+
+    guessedKey = doDifferentialAnalysis(spn, SBOX, inputDiff, outputDiff, 5000, 4)
+    print("\nGuessed Key:")
+    print("{:16b}".format(guessedKey))
+    print("Actual Key:")
+    print("{:16b}".format(KEY))
@@ -0,0 +1,198 @@
+import os
+import time
+
+sha1 = __import__("11_sha1")
+
+IPAD = 0x36
+OPAD = 0x5C
+
+def xorKey(key : bytes, pad : int) -> bytes:
+    """
+    Xors every byte of a key (padded with zeros to the block size) with a pad byte.
+
+    Args:
+        key (bytes): Key of at most sha1.Sha1.BLOCK_SIZE bytes.
+        pad (int): IPAD or OPAD.
+
+    Returns:
+        bytes: The block key ^ pad.
+    """
+    return bytes(b ^ pad for b in key.ljust(sha1.Sha1.BLOCK_SIZE, b"\x00"))
+
+class HmacSha1Key:
+    """
+    Key for HMAC-SHA1 with precomputed inner and outer states.
+
+    key ^ ipad and key ^ opad fill exactly one block each, so they are compressed once when the key is created.
+    Every message then only needs the compression of its own blocks and of the inner digest.
+    """
+
+    def __init__(self, key : bytes | bytearray):
+        """
+        Precomputes the inner and outer states.
+
+        Args:
+            key (bytes | bytearray): The key. Keys longer than one block are hashed first.
+        """
+        key = bytes(key)
+        if len(key) > sha1.Sha1.BLOCK_SIZE:
+            key = sha1.Sha1(key).digest()
+
+        self.inner = sha1.Sha1(xorKey(key, IPAD))
+        self.outer = sha1.Sha1(xorKey(key, OPAD))
+
+    def new(self, message : bytes | bytearray = b"") -> 'HmacSha1':
+        """
+        Starts a MAC computation with this key.
+
+        Args:
+            message (bytes | bytearray, optional): First data of the message. Defaults to b"".
+
+        Returns:
+            HmacSha1: Object with a streaming interface.
+        """
+        return HmacSha1(self, message)
+
+    def mac(self, message : bytes | bytearray) -> bytes:
+        """
+        Calculates the MAC of a whole message.
+
+        Args:
+            message (bytes | bytearray): The message.
+
+        Returns:
+            bytes: The 20 byte MAC.
+        """
+        inner = self.inner.copy()
+        inner.update(message)
+        outer = self.outer.copy()
+        outer.update(inner.digest())
+        return outer.digest()
+
+    def verify(self, message : bytes | bytearray, mac : bytes) -> bool:
+        """
+        Checks the MAC of a message.
+
+        Args:
+            message (bytes | bytearray): The message.
+            mac (bytes): The MAC to check.
+
+        Returns:
+            bool: Whether the MAC is correct.
+        """
+        expected = self.mac(message)
+        # compare all bytes, so the time doesn't leak the position of the first difference
+        return len(mac) == len(expected) and sum(a ^ b for a, b in zip(mac, expected)) == 0
+
+class HmacSha1:
+    """
+    Streaming HMAC-SHA1 with the interface of hashlib. (See sha1.Sha1)
+    """
+
+    def __init__(self, key : HmacSha1Key | bytes | bytearray, message : bytes | bytearray = b""):
+        """
+        Creates the object.
+
+        Args:
+            key (HmacSha1Key | bytes | bytearray): The key. Reuse a HmacSha1Key for many messages to skip the key setup.
+            message (bytes | bytearray, optional): First data of the message. Defaults to b"".
+        """
+        if not isinstance(key, HmacSha1Key):
+            key = HmacSha1Key(key)
+        self.key = key
+        self.inner = key.inner.copy()
+        self.inner.update(message)
+
+    def update(self, data : bytes | bytearray):
+        """
+        Adds data to the message.
+
+        Args:
+            data (bytes | bytearray): The data.
+        """
+        self.inner.update(data)
+
+    def copy(self) -> 'HmacSha1':
+        """
+        Clones the object.
+
+        Returns:
+            HmacSha1: Object with the same key and midstate.
+        """
+        other = HmacSha1.__new__(HmacSha1)
+        other.key = self.key
+        other.inner = self.inner.copy()
+        return other
+
+    def digest(self) -> bytes:
+        """
+        Returns the MAC of all data added so far.
+
+        Returns:
+            bytes: The 20 byte MAC.
+        """
+        outer = self.key.outer.copy()
+        outer.update(self.inner.digest())
+        return outer.digest()
+
+    def hexdigest(self) -> str:
+        """
+        Returns the MAC of all data added so far as hex string.
+
+        Returns:
+            str: The 40 hex digits of the MAC.
+        """
+        return self.digest().hex()
+
+def hmacSha1(key : bytes | bytearray, message : bytes | bytearray) -> bytes:
+    """
+    Calculates the HMAC-SHA1 of a message without caching the key states.
+
+    Args:
+        key (bytes | bytearray): The key.
+        message (bytes | bytearray): The message.
+
+    Returns:
+        bytes: The 20 byte MAC.
+    """
+    return HmacSha1Key(key).mac(message)
+
+def benchmarkHmac(payloadSizes : list[int] = [16, 64, 256], numMessages : int = 2000):
+    """
+    Compares the messages per second of HMAC-SHA1 with and without cached key states.
+
+    Args:
+        payloadSizes (list[int], optional): Byte lengths of the messages. Defaults to [16, 64, 256].
+        numMessages (int, optional): Number of messages per size. Defaults to 2000.
+    """
+    key = os.urandom(32)
+    hmacKey = HmacSha1Key(key)
+
+    for size in payloadSizes:
+        messages = [ os.urandom(size) for _ in range(numMessages) ]
+
+        start = time.perf_counter()
+        for message in messages:
+            hmacSha1(key, message)
+        uncached = numMessages / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for message in messages:
+            hmacKey.mac(message)
+        cached = numMessages / (time.perf_counter() - start)
+
+        print(f"{size} byte messages: {uncached:.0f} msg/s without, {cached:.0f} msg/s with cached key states")
+
+if __name__ == "__main__":
+    key = HmacSha1Key(b"key")
+    mac = key.mac(b"The quick brown fox jumps over the lazy dog")
+    print(mac.hex())
+    print(key.verify(b"The quick brown fox jumps over the lazy dog", mac))
+    print(key.verify(b"The quick brown fox jumps over the lazy cat", mac))
+
+    # streaming
+    hmac = key.new(b"The quick brown fox ")
+    hmac.update(b"jumps over the lazy dog")
+    print(hmac.hexdigest())
+
+    benchmarkHmac()
@@ -0,0 +1,225 @@
+import mmap
+from typing import Callable
+from pathlib import Path
+
+import include.utils as utils
+
+# RFC 3526 MODP groups (bits -> prime p as hex). p is a safe prime and the generator is 2.
+MODP_GROUPS_HEX = {
+    # group 5
+    1536 : """
+    FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74
+    020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437
+    4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED
+    EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05
+    98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB
+    9ED529077096966D670C354E4ABC9804F1746C08CA237327FFFFFFFFFFFFFFFF
+    """,
+    # group 14
+    2048 : """
+    FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74
+    020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437
+    4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED
+    EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05
+    98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB
+    9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B
+    E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718
+    3995497CEA956AE515D2261898FA051015728E5A8AACAA68FFFFFFFFFFFFFFFF
+    """,
+    # group 15
+    3072 : """
+    FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74
+    020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437
+    4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED
+    EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05
+    98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB
+    9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B
+    E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718
+    3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33
+    A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7
+    ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864
+    D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2
+    08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A93AD2CAFFFFFFFFFFFFFFFF
+    """,
+    # group 16
+    4096 : """
+    FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74
+    020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437
+    4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED
+    EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05
+    98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB
+    9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B
+    E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718
+    3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33
+    A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7
+    ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864
+    D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2
+    08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A92108011A723C12A787E6D7
+    88719A10BDBA5B2699C327186AF4E23C1A946834B6150BDA2583E9CA2AD44CE8
+    DBBBC2DB04DE8EF92E8EFC141FBECAA6287C59474E6BC05D99B2964FA090C3A2
+    233BA186515BE7ED1F612970CEE2D7AFB81BDD762170481CD0069127D5B05AA9
+    93B4EA988D8FDDC186FFB7DC90A6C08F4DF435C934063199FFFFFFFFFFFFFFFF
+    """,
+    # group 17
+    6144 : """
+    FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74
+    020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437
+    4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED
+    EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05
+    98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB
+    9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B
+    E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718
+    3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33
+    A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7
+    ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864
+    D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2
+    08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A92108011A723C12A787E6D7
+    88719A10BDBA5B2699C327186AF4E23C1A946834B6150BDA2583E9CA2AD44CE8
+    DBBBC2DB04DE8EF92E8EFC141FBECAA6287C59474E6BC05D99B2964FA090C3A2
+    233BA186515BE7ED1F612970CEE2D7AFB81BDD762170481CD0069127D5B05AA9
+    93B4EA988D8FDDC186FFB7DC90A6C08F4DF435C93402849236C3FAB4D27C7026
+    C1D4DCB2602646DEC9751E763DBA37BDF8FF9406AD9E530EE5DB382F413001AE
+    B06A53ED9027D831179727B0865A8918DA3EDBEBCF9B14ED44CE6CBACED4BB1B
+    DB7F1447E6CC254B332051512BD7AF426FB8F401378CD2BF5983CA01C64B92EC
+    F032EA15D1721D03F482D7CE6E74FEF6D55E702F46980C82B5A84031900B1C9E
+    59E7C97FBEC7E8F323A97A7E36CC88BE0F1D45B7FF585AC54BD407B22B4154AA
+    CC8F6D7EBF48E1D814CC5ED20F8037E0A79715EEF29BE32806A1D58BB7C5DA76
+    F550AA3D8A1FBFF0EB19CCB1A313D55CDA56C9EC2EF29632387FE8D76E3C0468
+    043E8F663F4860EE12BF2D5B0B7474D6E694F91E6DCC4024FFFFFFFFFFFFFFFF
+    """,
+    # group 18
+    8192 : """
+    FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74
+    020BBEA63B139B22514A08798E3404DDEF9519B3CD3A431B302B0A6DF25F1437
+    4FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED
+    EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF05
+    98DA48361C55D39A69163FA8FD24CF5F83655D23DCA3AD961C62F356208552BB
+    9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B
+    E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF695581718
+    3995497CEA956AE515D2261898FA051015728E5A8AAAC42DAD33170D04507A33
+    A85521ABDF1CBA64ECFB850458DBEF0A8AEA71575D060C7DB3970F85A6E1E4C7
+    ABF5AE8CDB0933D71E8C94E04A25619DCEE3D2261AD2EE6BF12FFA06D98A0864
+    D87602733EC86A64521F2B18177B200CBBE117577A615D6C770988C0BAD946E2
+    08E24FA074E5AB3143DB5BFCE0FD108E4B82D120A92108011A723C12A787E6D7
+    88719A10BDBA5B2699C327186AF4E23C1A946834B6150BDA2583E9CA2AD44CE8
+    DBBBC2DB04DE8EF92E8EFC141FBECAA6287C59474E6BC05D99B2964FA090C3A2
+    233BA186515BE7ED1F612970CEE2D7AFB81BDD762170481CD0069127D5B05AA9
+    93B4EA988D8FDDC186FFB7DC90A6C08F4DF435C93402849236C3FAB4D27C7026
+    C1D4DCB2602646DEC9751E763DBA37BDF8FF9406AD9E530EE5DB382F413001AE
+    B06A53ED9027D831179727B0865A8918DA3EDBEBCF9B14ED44CE6CBACED4BB1B
+    DB7F1447E6CC254B332051512BD7AF426FB8F401378CD2BF5983CA01C64B92EC
+    F032EA15D1721D03F482D7CE6E74FEF6D55E702F46980C82B5A84031900B1C9E
+    59E7C97FBEC7E8F323A97A7E36CC88BE0F1D45B7FF585AC54BD407B22B4154AA
+    CC8F6D7EBF48E1D814CC5ED20F8037E0A79715EEF29BE32806A1D58BB7C5DA76
+    F550AA3D8A1FBFF0EB19CCB1A313D55CDA56C9EC2EF29632387FE8D76E3C0468
+    043E8F663F4860EE12BF2D5B0B7474D6E694F91E6DBE115974A3926F12FEE5E4
+    38777CB6A932DF8CD8BEC4D073B931BA3BC832B68D9DD300741FA7BF8AFC47ED
+    2576F6936BA424663AAB639C5AE4F5683423B4742BF1C978238F16CBE39D652D
+    E3FDB8BEFC848AD922222E04A4037C0713EB57A81A23F0C73473FC646CEA306B
+    4BCBC8862F8385DDFA9D4B7FA2C087E879683303ED5BDD3A062B3CF5B3A278A6
+    6D2A13F83F44F82DDF310EE074AB6A364597E899A0255DC164F31CC50846851D
+    F9AB48195DED7EA1B1D510BD7EE74D73FAF36BC31ECFA268359046F4EB879F92
+    4009438B481C6CD7889A002ED5EE382BC9190DA6FC026E479558E4475677E9AA
+    9E3050E2765694DFC81F56E880B96E7160C980DD98EDD3DFFFFFFFFFFFFFFFFF
+    """,
+}
+
+MODP_GENERATOR = 2
+
+# miller rabin rounds for revalidating values read from a file. The default rounds of checkPrime assume random
+# candidates, values from a file might be chosen to fool the test. 40 rounds leave an error of at most 4^-40.
+VALIDATION_TRIES = 40
+
+def modpGroup(bits : int) -> tuple[int] | None:
+    """
+    Returns the RFC 3526 MODP group of the given size.
+
+    Args:
+        bits (int): Size of the modulus. One of 1536, 2048, 3072, 4096, 6144, 8192.
+
+    Returns:
+        tuple[int] | None: Modulus p, Generator g or None if there is no such group.
+    """
+    if bits not in MODP_GROUPS_HEX:
+        return None
+    return int("".join(MODP_GROUPS_HEX[bits].split()), 16), MODP_GENERATOR
+
+
+class ParameterCache:
+    """
+    On-disk cache of generated and validated public parameters.
+
+    Every line of the file is one parameter set: "<kind> <size> <values in hex>", where kind is dh (p, g) or
+    dsa (p, q, g) and size is the bit length of p (and q for dsa, eg. 2048/224). The file is only opened on the
+    first lookup. It is memory-mapped and only the line offsets are indexed, a parameter set is parsed when it is asked for.
+    """
+
+    def __init__(self, path : Path):
+        self.path = Path(path)
+        self.index = None
+
+    def buildIndex(self):
+        """
+        Maps every (kind, size) to the offsets of its lines in the file.
+        """
+        self.index = {}
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return
+
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = 0
+            while offset < len(data):
+                end = data.find(b"\n", offset)
+                end = len(data) if end == -1 else end
+                fields = data[offset : end].split(b" ", 2)
+                if len(fields) == 3:
+                    self.index.setdefault((fields[0].decode(), fields[1].decode()), []).append(offset)
+                offset = end + 1
+
+    def lookup(self, kind : str, size : str, validate : Callable[[tuple[int]], bool] | None = None) -> tuple[int] | None:
+        """
+        Returns the first cached parameter set of the given kind and size that passes the validation.
+
+        Args:
+            kind (str): "dh" or "dsa".
+            size (str): Size key, eg. "2048" or "2048/224".
+            validate (Callable[[tuple[int]], bool] | None, optional): Only parameter sets for which it returns True are returned. Defaults to None (all pass).
+
+        Returns:
+            tuple[int] | None: The parameters or None if there are no (valid) ones in the cache.
+        """
+        if self.index is None:
+            self.buildIndex()
+        offsets = self.index.get((kind, size))
+        if not offsets:
+            return None
+
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for offset in offsets:
+                end = data.find(b"\n", offset)
+                line = data[offset : len(data) if end == -1 else end]
+                values = tuple(int(value, 16) for value in line.split(b" ")[2:])
+                if validate is None or validate(values):
+                    return values
+        return None
+
+    def store(self, kind : str, size : str, values : tuple[int]):
+        """
+        Appends a parameter set to the cache. The values have to be validated before.
+
+        Args:
+            kind (str): "dh" or "dsa".
+            size (str): Size key, eg. "2048" or "2048/224".
+            values (tuple[int]): The parameters.
+        """
+        if self.index is None:
+            self.buildIndex()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            f.write(" ".join([kind, size] + [ format(value, "x") for value in values ]).encode() + b"\n")
+        self.index.setdefault((kind, size), []).append(offset)
+
+# the default cache in the resource folder
+DEFAULT_CACHE = ParameterCache(utils.RES_FOLDER / "parameter_cache.txt")